@@ -1,22 +1,29 @@
 """
 Video/playlist analysis module.
 
-Two-phase analysis:
-  Phase 1: yt-dlp -J <url> for basic metadata
-  Phase 2: yt-dlp --list-formats <url> for reliable format table parsing
+Single-pass analysis: yt-dlp -J <url> provides both metadata and formats.
+`yt-dlp --list-formats` output is parsed only when the JSON carries no formats.
 
 Usage:
   python -m python.analyze video <url>
   python -m python.analyze playlist <url>
 """
 
+import functools
 import json
+import os
 import re
 import subprocess
 import sys
+import threading
 
-from python.protocol import emit_result, emit_error, emit_log, emit_progress
-from python.models import VideoInfo, VideoFormat, Chapter, PlaylistItem
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+from python.protocol import emit_result, emit_error, emit_log, emit_progress, json_loads
+from python.models import VideoInfo, VideoFormat, Chapter
 from python.errors import classify_error
 from python.exec_resolve import build_ytdlp_cmd, get_env
 from python.utils import parse_youtube_url
@@ -25,17 +32,40 @@ from python.utils import parse_youtube_url
 TIMEOUT_VIDEO = 90
 TIMEOUT_PLAYLIST = 120
 
-
-def _get_cookie_args() -> list[str]:
-    """Get cookie arguments from environment if set."""
-    browser = __import__("os").environ.get("COOKIES_BROWSER")
-    profile = __import__("os").environ.get("COOKIES_PROFILE")
+# Format table columns, matched at the start of each whitespace-separated token.
+# Filesize is tried before bitrate so "512KiB" is never read as a 512k bitrate.
+_FMT_LINE_RE = re.compile(
+    r"(?<!\S)(?:"
+    r"(?P<res>(?P<w>\d{3,4})x(?P<rh>\d{3,4}))"
+    r"|(?P<height>(?P<ph>\d{3,4})p)"
+    r"|(?P<fps>(?P<fv>\d+)fps)"
+    r"|(?P<vcodec>(?:avc1|h264|vp0?9|av01)\S*)"
+    r"|(?P<acodec>(?:mp4a|aac|opus)\S*)"
+    r"|(?P<size>~?(?P<sv>\d+\.?\d*)(?P<su>Mi|Gi|Ki)B)"
+    r"|(?P<br>~?(?P<bv>\d+\.?\d*)[kK])"
+    r")"
+)
+_FORMAT_NOTE_RE = re.compile(r"(video|audio) only", re.IGNORECASE)
+_SIZE_UNITS = {"Ki": 1024, "Mi": 1024 * 1024, "Gi": 1024 * 1024 * 1024}
+
+# Placeholder titles yt-dlp uses for entries that can't be downloaded
+_UNAVAILABLE_TITLES = ("[Private video]", "[Deleted video]")
+
+
+@functools.lru_cache(maxsize=1)
+def _get_cookie_args() -> tuple[str, ...]:
+    """
+    Get cookie arguments from environment if set.
+    The environment is fixed for the life of the process, so this is computed once.
+    """
+    browser = os.environ.get("COOKIES_BROWSER")
+    profile = os.environ.get("COOKIES_PROFILE")
     if browser:
         cookie_str = browser
         if profile:
             cookie_str += f":{profile}"
-        return ["--cookies-from-browser", cookie_str]
-    return []
+        return ("--cookies-from-browser", cookie_str)
+    return ()
 
 
 def analyze_video(url: str) -> dict:
@@ -43,15 +73,15 @@ def analyze_video(url: str) -> dict:
     parsed = parse_youtube_url(url)
 
     # Check for Mix playlists — fall back to single video
-    if parsed["is_mix"]:
+    if parsed.is_mix:
         emit_log("warning", "Mix/Radio playlists can't be downloaded as playlists. Downloading single video.")
-        if parsed["video_id"]:
-            url = f"https://www.youtube.com/watch?v={parsed['video_id']}"
+        if parsed.video_id:
+            url = f"https://www.youtube.com/watch?v={parsed.video_id}"
 
     emit_log("info", "Fetching video info...")
     emit_progress("analyze", 10)
 
-    # Phase 1: Basic metadata via -J
+    # Metadata and formats via -J
     cmd = build_ytdlp_cmd([
         "-J", "--no-playlist",
         *_get_cookie_args(),
@@ -60,7 +90,7 @@ def analyze_video(url: str) -> dict:
 
     try:
         proc = subprocess.run(
-            cmd, capture_output=True, text=True,
+            cmd, capture_output=True,
             timeout=TIMEOUT_VIDEO, env=get_env()
         )
     except subprocess.TimeoutExpired:
@@ -68,12 +98,12 @@ def analyze_video(url: str) -> dict:
         return None
 
     if proc.returncode != 0:
-        err = classify_error(proc.stderr)
+        err = classify_error(proc.stderr.decode("utf-8", "replace"))
         emit_error(err.code, err.message)
         return None
 
     try:
-        data = json.loads(proc.stdout)
+        data = json_loads(proc.stdout)
     except json.JSONDecodeError:
         emit_error("parse_error", "Failed to parse yt-dlp output")
         return None
@@ -85,62 +115,68 @@ def analyze_video(url: str) -> dict:
         id=data.get("id", ""),
         title=data.get("title", "Unknown"),
         channel=data.get("channel", data.get("uploader", "Unknown")),
-        duration=data.get("duration", 0) or 0,
-        views=data.get("view_count", 0) or 0,
+        duration=data.get("duration") or 0,
+        views=data.get("view_count") or 0,
         url=url,
         thumbnail_url=data.get("thumbnail", ""),
         upload_date=data.get("upload_date", ""),
     )
 
     # Parse chapters
-    for ch in data.get("chapters", []) or []:
+    for ch in data.get("chapters") or []:
         info.chapters.append(Chapter(
             title=ch.get("title", ""),
             start_time=ch.get("start_time", 0),
             end_time=ch.get("end_time", 0),
         ))
 
-    emit_log("info", "Fetching format table...")
-    emit_progress("analyze", 60)
+    # Formats come straight from the -J payload; the text table is only
+    # consulted when the JSON carried no formats.
+    info.formats = _parse_json_formats(data.get("formats") or [])
+    if not info.formats:
+        emit_log("info", "No formats in JSON output, fetching format table...")
+        emit_progress("analyze", 60)
+        info.formats = _fetch_format_table(url)
+
+    emit_progress("analyze", 100)
+    emit_log("info", f"Found {len(info.formats)} formats, {len(info.chapters)} chapters")
 
-    # Phase 2: Format table parsing (more reliable than -J formats)
-    fmt_cmd = build_ytdlp_cmd([
+    return info.to_dict()
+
+
+def _fetch_format_table(url: str) -> list[VideoFormat]:
+    """Fallback: run yt-dlp --list-formats and parse the text table."""
+    cmd = build_ytdlp_cmd([
         "--list-formats", "--no-playlist",
         *_get_cookie_args(),
         url,
     ])
 
     try:
-        fmt_proc = subprocess.run(
-            fmt_cmd, capture_output=True, text=True,
+        proc = subprocess.run(
+            cmd, capture_output=True, text=True,
             timeout=TIMEOUT_VIDEO, env=get_env()
         )
-        if fmt_proc.returncode == 0:
-            info.formats = _parse_format_table(fmt_proc.stdout)
     except subprocess.TimeoutExpired:
-        emit_log("warning", "Format table fetch timed out, using JSON formats")
-        # Fallback to -J formats
-        info.formats = _parse_json_formats(data.get("formats", []))
-
-    # If format table parsing returned nothing, fall back
-    if not info.formats:
-        info.formats = _parse_json_formats(data.get("formats", []))
+        emit_log("warning", "Format table fetch timed out")
+        return []
 
-    emit_progress("analyze", 100)
-    emit_log("info", f"Found {len(info.formats)} formats, {len(info.chapters)} chapters")
-
-    return info.to_dict()
+    if proc.returncode != 0:
+        return []
+    return _parse_format_table(proc.stdout)
 
 
 def _parse_format_table(output: str) -> list[VideoFormat]:
     """
     Parse yt-dlp --list-formats text table output.
-    This is more reliable than -J for finding all available formats.
+    Only used when the -J output carries no formats.
     """
     formats = []
     in_table = False
+    scan = _FMT_LINE_RE.finditer
+    note_search = _FORMAT_NOTE_RE.search
 
-    for line in output.split("\n"):
+    for line in output.splitlines():
         line = line.strip()
 
         # Detect table start
@@ -152,72 +188,48 @@ def _parse_format_table(output: str) -> list[VideoFormat]:
         if not in_table or not line:
             continue
 
-        # Parse format line
-        parts = line.split()
-        if len(parts) < 3:
+        # Parse format line: ID and EXT are always the first two columns
+        format_id, _, rest = line.partition(" ")
+        ext, _, rest = rest.lstrip().partition(" ")
+        if not rest:
             continue
 
-        fmt = VideoFormat(format_id=parts[0], ext=parts[1])
-
-        # Try to extract resolution
-        for part in parts:
-            m = re.match(r"(\d{3,4})x(\d{3,4})", part)
-            if m:
-                fmt.width = int(m.group(1))
-                fmt.height = int(m.group(2))
-                break
-            # Also try standalone height like "1080p"
-            m2 = re.match(r"(\d{3,4})p", part)
-            if m2:
-                fmt.height = int(m2.group(1))
-                break
-
-        # Extract codec info
-        for part in parts:
-            if part.startswith("avc1") or part.startswith("h264"):
-                fmt.vcodec = part
-            elif part.startswith("vp9") or part.startswith("vp09"):
-                fmt.vcodec = part
-            elif part.startswith("av01"):
-                fmt.vcodec = part
-            elif part.startswith("mp4a") or part.startswith("aac"):
-                fmt.acodec = part
-            elif part.startswith("opus"):
-                fmt.acodec = part
-
-        # Extract FPS
-        for part in parts:
-            m = re.match(r"(\d+)fps", part)
-            if m:
-                fmt.fps = float(m.group(1))
-                break
-
-        # Extract bitrate
-        for part in parts:
-            m = re.match(r"~?(\d+\.?\d*)k", part, re.IGNORECASE)
-            if m:
-                fmt.tbr = float(m.group(1))
-                break
-
-        # Extract filesize
-        for part in parts:
-            m = re.match(r"~?(\d+\.?\d*)(Mi|Gi|Ki)B", part)
-            if m:
-                val = float(m.group(1))
-                unit = m.group(2)
-                if unit == "Gi":
-                    fmt.filesize_approx = int(val * 1024 * 1024 * 1024)
-                elif unit == "Mi":
-                    fmt.filesize_approx = int(val * 1024 * 1024)
-                elif unit == "Ki":
-                    fmt.filesize_approx = int(val * 1024)
-                break
+        fmt = VideoFormat(format_id=format_id, ext=ext)
+        have_res = have_fps = have_br = have_size = False
+
+        # Single scan over the remaining columns; each token matches at most one field
+        for m in scan(rest):
+            kind = m.lastgroup
+            if kind == "res":
+                if not have_res:
+                    fmt.width = int(m.group("w"))
+                    fmt.height = int(m.group("rh"))
+                    have_res = True
+            elif kind == "height":
+                if not have_res:
+                    fmt.height = int(m.group("ph"))
+                    have_res = True
+            elif kind == "vcodec":
+                fmt.vcodec = m.group(kind)
+            elif kind == "acodec":
+                fmt.acodec = m.group(kind)
+            elif kind == "fps":
+                if not have_fps:
+                    fmt.fps = float(m.group("fv"))
+                    have_fps = True
+            elif kind == "size":
+                if not have_size:
+                    fmt.filesize_approx = int(float(m.group("sv")) * _SIZE_UNITS[m.group("su")])
+                    have_size = True
+            elif kind == "br":
+                if not have_br:
+                    fmt.tbr = float(m.group("bv"))
+                    have_br = True
 
         # Determine format note
-        if "video only" in line.lower():
-            fmt.format_note = "video only"
-        elif "audio only" in line.lower():
-            fmt.format_note = "audio only"
+        m = note_search(line)
+        if m:
+            fmt.format_note = f"{m.group(1).lower()} only"
 
         if fmt.height > 0 or fmt.acodec:
             formats.append(fmt)
@@ -226,18 +238,18 @@ def _parse_format_table(output: str) -> list[VideoFormat]:
 
 
 def _parse_json_formats(json_formats: list) -> list[VideoFormat]:
-    """Fallback: parse formats from -J JSON output."""
+    """Parse formats from -J JSON output."""
     formats = []
     for f in json_formats:
         fmt = VideoFormat(
             format_id=f.get("format_id", ""),
             ext=f.get("ext", ""),
-            height=f.get("height", 0) or 0,
-            width=f.get("width", 0) or 0,
-            fps=f.get("fps", 0) or 0,
-            vcodec=f.get("vcodec", "none") or "none",
-            acodec=f.get("acodec", "none") or "none",
-            tbr=f.get("tbr", 0) or 0,
+            height=f.get("height") or 0,
+            width=f.get("width") or 0,
+            fps=f.get("fps") or 0,
+            vcodec=f.get("vcodec") or "none",
+            acodec=f.get("acodec") or "none",
+            tbr=f.get("tbr") or 0,
             filesize=f.get("filesize"),
             filesize_approx=f.get("filesize_approx"),
             format_note=f.get("format_note", ""),
@@ -258,9 +270,47 @@ def analyze_playlist(url: str) -> dict:
         url,
     ])
 
+    # Stream entries as yt-dlp emits them when ijson is available
+    fetched = _stream_playlist(cmd) if ijson else _fetch_playlist(cmd)
+    if fetched is None:
+        return None
+    meta, items = fetched
+
+    emit_progress("analyze", 100)
+    emit_log("info", f"Found {len(items)} videos in playlist")
+
+    result = {
+        "playlist_title": meta.get("title", "Playlist"),
+        "playlist_id": meta.get("id", ""),
+        "items": items,
+    }
+
+    return result
+
+
+def _playlist_item(i: int, entry: dict) -> dict:
+    """
+    Build a playlist item dict (PlaylistItem.to_dict() shape) from a
+    --flat-playlist entry at position i, without the dataclass round-trip.
+    """
+    video_id = entry.get("id") or ""
+    title = entry.get("title")
+    return {
+        "id": video_id,
+        "title": title or f"Video {i+1}",
+        "url": entry.get("url") or f"https://www.youtube.com/watch?v={video_id}",
+        "duration": entry.get("duration") or 0,
+        "channel": entry.get("channel") or entry.get("uploader") or "",
+        "index": i + 1,
+        "is_available": title not in _UNAVAILABLE_TITLES,
+    }
+
+
+def _fetch_playlist(cmd: list[str]) -> tuple[dict, list[dict]] | None:
+    """Run yt-dlp -J and parse the buffered output. Emits an error and returns None on failure."""
     try:
         proc = subprocess.run(
-            cmd, capture_output=True, text=True,
+            cmd, capture_output=True,
             timeout=TIMEOUT_PLAYLIST, env=get_env()
         )
     except subprocess.TimeoutExpired:
@@ -268,40 +318,97 @@ def analyze_playlist(url: str) -> dict:
         return None
 
     if proc.returncode != 0:
-        err = classify_error(proc.stderr)
+        err = classify_error(proc.stderr.decode("utf-8", "replace"))
         emit_error(err.code, err.message)
         return None
 
     try:
-        data = json.loads(proc.stdout)
+        data = json_loads(proc.stdout)
     except json.JSONDecodeError:
         emit_error("parse_error", "Failed to parse playlist data")
         return None
 
     items = []
-    for i, entry in enumerate(data.get("entries", []) or []):
+    for i, entry in enumerate(data.get("entries") or []):
         if not entry:
             continue
-        items.append(PlaylistItem(
-            id=entry.get("id", ""),
-            title=entry.get("title", f"Video {i+1}"),
-            url=entry.get("url", f"https://www.youtube.com/watch?v={entry.get('id', '')}"),
-            duration=entry.get("duration", 0) or 0,
-            channel=entry.get("channel", entry.get("uploader", "")),
-            index=i + 1,
-            is_available=entry.get("title") != "[Private video]" and entry.get("title") != "[Deleted video]",
-        ))
+        items.append(_playlist_item(i, entry))
 
-    emit_progress("analyze", 100)
-    emit_log("info", f"Found {len(items)} videos in playlist")
+    return {"title": data.get("title", "Playlist"), "id": data.get("id", "")}, items
 
-    result = {
-        "playlist_title": data.get("title", "Playlist"),
-        "playlist_id": data.get("id", ""),
-        "items": [item.to_dict() for item in items],
-    }
 
-    return result
+def _stream_playlist(cmd: list[str]) -> tuple[dict, list[dict]] | None:
+    """
+    Run yt-dlp -J and parse its stdout incrementally with ijson.
+    Entries are built as they arrive instead of after the whole document is
+    buffered, and the top-level title/id are picked up in the same pass.
+    Emits an error and returns None on failure.
+    """
+    proc = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=get_env()
+    )
+
+    stderr_chunks = []
+    drain = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+    drain.start()
+
+    timed_out = threading.Event()
+
+    def _kill():
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(TIMEOUT_PLAYLIST, _kill)
+    timer.start()
+
+    meta = {}
+    items = []
+    builder = None
+    index = 0
+    parse_failed = False
+    try:
+        for prefix, event, value in ijson.parse(proc.stdout, use_float=True):
+            if builder is not None:
+                builder.event(event, value)
+                if prefix == "entries.item" and event == "end_map":
+                    items.append(_playlist_item(index, builder.value))
+                    builder = None
+                    index += 1
+                    if index % 25 == 0:
+                        emit_progress("analyze", 10 + min(80, index / 10))
+            elif prefix == "entries.item":
+                if event == "start_map":
+                    builder = ijson.ObjectBuilder()
+                    builder.event(event, value)
+                else:
+                    index += 1  # null entry (unavailable video)
+            elif prefix in ("title", "id") and event == "string":
+                meta[prefix] = value
+    except ijson.JSONError:
+        parse_failed = True
+        # Keep draining so yt-dlp can't block on a full pipe; the kill
+        # timer still bounds how long that takes
+        for _ in iter(lambda: proc.stdout.read(65536), b""):
+            pass
+    finally:
+        proc.wait()
+        timer.cancel()
+        drain.join()
+
+    if timed_out.is_set():
+        emit_error("timeout", f"Playlist analysis timed out after {TIMEOUT_PLAYLIST}s")
+        return None
+
+    if proc.returncode != 0:
+        err = classify_error(b"".join(stderr_chunks).decode("utf-8", "replace"))
+        emit_error(err.code, err.message)
+        return None
+
+    if parse_failed:
+        emit_error("parse_error", "Failed to parse playlist data")
+        return None
+
+    return meta, items
 
 
 def main():
@@ -2,6 +2,8 @@
 Chapter splitting module.
 
 3-stage pipeline: download once → encode once → split with -c copy (instant).
+All chapters are cut in a single ffmpeg pass with the segment muxer; the
+per-chapter -ss/-to path is kept for chapter sets that overlap.
 Output: Video Title/01 - Chapter Name.mp4
 
 Usage:
@@ -10,14 +12,24 @@ Usage:
 
 import json
 import os
-import re
 import subprocess
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 from python.protocol import emit_result, emit_error, emit_log, emit_progress
 from python.exec_resolve import find_ffmpeg, get_env
-from python.utils import sanitize_filename
+from python.convert import drain_stderr, read_ffmpeg_progress
+from python.utils import sanitize_filename, sanitize_filenames_batch
+
+
+# Temporary segment muxer output names, renamed to "NN - Title.mp4" afterwards
+_SEGMENT_PREFIX = ".segment_"
+# Segment muxer's record of the segments it actually wrote
+_SEGMENT_LIST = f"{_SEGMENT_PREFIX}list.csv"
+
+# Upper bound on concurrent per-chapter ffmpeg processes
+MAX_SPLIT_WORKERS = 8
 
 
 def split_chapters(
@@ -38,49 +50,233 @@ def split_chapters(
     chapter_dir = Path(output_dir) / safe_title
     chapter_dir.mkdir(parents=True, exist_ok=True)
 
-    output_files = []
     total = len(chapters)
 
-    for i, ch in enumerate(chapters):
-        chapter_title = ch.get("title", f"Chapter {i+1}")
-        start = ch.get("start_time", 0)
-        end = ch.get("end_time", 0)
-
-        safe_chapter = sanitize_filename(chapter_title)
-        filename = f"{i+1:02d} - {safe_chapter}.mp4"
-        output_path = str(chapter_dir / filename)
-
-        pct = stage_offset + (i / total) * stage_weight
-        emit_progress("split_chapters", pct)
-        emit_log("info", f"Splitting chapter {i+1}/{total}: {chapter_title}")
-
-        cmd = [
-            ffmpeg, "-y",
-            "-i", video_file,
-            "-ss", str(start),
-            "-to", str(end),
-            "-c", "copy",
-            "-movflags", "+faststart",
-            output_path,
-        ]
+    # Sanitize every chapter title once; both split strategies reuse the paths
+    chapter_titles = sanitize_filenames_batch(
+        [ch.get("title", f"Chapter {i+1}") for i, ch in enumerate(chapters)]
+    )
+    output_paths = [
+        chapter_dir / f"{i+1:02d} - {safe}.mp4"
+        for i, safe in enumerate(chapter_titles)
+    ]
 
-        try:
-            proc = subprocess.run(
-                cmd, capture_output=True, text=True,
-                timeout=120, env=get_env()
-            )
-            if proc.returncode == 0:
-                output_files.append(output_path)
-            else:
-                emit_log("warning", f"Failed to split chapter: {chapter_title}")
-        except subprocess.TimeoutExpired:
-            emit_log("warning", f"Chapter split timed out: {chapter_title}")
+    output_files = _split_segmented(
+        ffmpeg, video_file, chapters, output_paths, chapter_dir, stage_offset, stage_weight
+    )
+    if output_files is None:
+        emit_log("info", "Single-pass split unavailable, splitting chapters individually")
+        output_files = _split_individually(
+            ffmpeg, video_file, chapters, output_paths, stage_offset, stage_weight
+        )
 
     emit_progress("split_chapters", stage_offset + stage_weight)
     emit_log("info", f"Split {len(output_files)}/{total} chapters")
     return output_files
 
 
+def _split_segmented(
+    ffmpeg: str,
+    video_file: str,
+    chapters: list[dict],
+    output_paths: list[Path],
+    chapter_dir: Path,
+    stage_offset: float,
+    stage_weight: float,
+) -> list[str] | None:
+    """
+    Split all chapters in one ffmpeg run with the segment muxer.
+    Cuts at every chapter boundary, then renames the segments that line up
+    with a chapter and discards the gaps between non-contiguous chapters.
+    Returns None if the chapters can't be expressed as segments (overlaps),
+    ffmpeg fails, or the segments written don't match the requested cuts
+    (stream copy can only cut on keyframes, so two cuts inside one GOP
+    yield one segment), so the caller can fall back to per-chapter splitting.
+    """
+    cuts = sorted({
+        float(t) for ch in chapters
+        for t in (ch.get("start_time", 0), ch.get("end_time", 0))
+        if float(t) > 0
+    })
+    if not cuts:
+        return None
+
+    # Segment k covers [points[k], points[k+1])
+    points = [0.0] + cuts
+    seg_index = {t: k for k, t in enumerate(points)}
+    chapter_segments = []
+    for ch in chapters:
+        start = float(ch.get("start_time", 0))
+        end = float(ch.get("end_time", 0))
+        k = seg_index.get(start)
+        if k is None or end <= start or points[k + 1] != end:
+            return None
+        chapter_segments.append(k)
+
+    emit_log("info", f"Splitting {len(chapters)} chapters in a single pass")
+
+    cmd = [
+        ffmpeg, "-y",
+        "-nostats", "-progress", "pipe:1",
+        "-i", video_file,
+        "-c", "copy",
+        "-f", "segment",
+        "-segment_times", ",".join(str(t) for t in cuts),
+        "-segment_list", str(chapter_dir / _SEGMENT_LIST),
+        "-segment_list_type", "csv",
+        "-segment_format_options", "movflags=+faststart",
+        "-reset_timestamps", "1",
+        str(chapter_dir / f"{_SEGMENT_PREFIX}%03d.mp4"),
+    ]
+
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=get_env(),
+        )
+        stderr_thread, stderr_tail = drain_stderr(proc)
+
+        for progress in read_ffmpeg_progress(proc.stdout, cuts[-1]):
+            overall = stage_offset + (progress["percent"] / 100.0) * stage_weight
+            emit_progress("split_chapters", overall)
+
+        proc.wait()
+        stderr_thread.join(timeout=5)
+    except Exception as e:
+        emit_log("warning", f"Single-pass chapter split failed: {e}")
+        _remove_segments(chapter_dir)
+        return None
+
+    if proc.returncode != 0:
+        stderr_out = "".join(stderr_tail).strip()
+        emit_log("warning", f"Single-pass chapter split failed: {stderr_out[-200:]}")
+        _remove_segments(chapter_dir)
+        return None
+
+    segment_files = _match_segments(chapter_dir, points)
+    if segment_files is None:
+        emit_log("info", "Chapter cuts don't land on distinct keyframes")
+        _remove_segments(chapter_dir)
+        return None
+
+    output_files = []
+    for i, (ch, k, output_path) in enumerate(zip(chapters, chapter_segments, output_paths)):
+        segment = segment_files[k]
+        try:
+            os.replace(segment, output_path)
+            output_files.append(str(output_path))
+        except OSError:
+            emit_log("warning", f"Failed to split chapter: {ch.get('title', f'Chapter {i+1}')}")
+
+    _remove_segments(chapter_dir)
+    return output_files
+
+
+def _match_segments(chapter_dir: Path, points: list[float]) -> list[Path] | None:
+    """
+    Segment files in cut-point order, from the muxer's segment list.
+    None unless there is one segment per cut point and each segment's real
+    start time is nearest to its own cut point.
+    """
+    try:
+        lines = (chapter_dir / _SEGMENT_LIST).read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return None
+
+    files = []
+    for line in lines:
+        name, _, rest = line.partition(",")
+        try:
+            start = float(rest.partition(",")[0])
+        except ValueError:
+            return None
+        k = len(files)
+        if k >= len(points):
+            return None
+        nearest = min(range(len(points)), key=lambda j: abs(points[j] - start))
+        if nearest != k:
+            return None
+        files.append(chapter_dir / os.path.basename(name))
+
+    # The tail segment after the last cut is never a chapter and may be
+    # absent when the last cut is the end of the file
+    return files if len(files) >= len(points) - 1 else None
+
+
+def _remove_segments(chapter_dir: Path):
+    """Delete leftover segment muxer output (gaps, tail, failed runs)."""
+    for f in chapter_dir.glob(f"{_SEGMENT_PREFIX}*"):
+        try:
+            f.unlink()
+        except OSError:
+            pass
+
+
+def _split_individually(
+    ffmpeg: str,
+    video_file: str,
+    chapters: list[dict],
+    output_paths: list[Path],
+    stage_offset: float,
+    stage_weight: float,
+) -> list[str]:
+    """
+    Split chapters with one ffmpeg -ss/-to stream copy per chapter.
+    Stream copy is I/O-bound, so the ffmpeg processes run concurrently.
+    """
+    total = len(chapters)
+    results = {}
+
+    workers = min(MAX_SPLIT_WORKERS, os.cpu_count() or 4, total) or 1
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = {
+            ex.submit(_split_one, ffmpeg, video_file, ch, i, output_paths[i]): i
+            for i, ch in enumerate(chapters)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            results[i] = future.result()
+            emit_progress("split_chapters", stage_offset + (done / total) * stage_weight)
+
+    # Keep chapter order regardless of completion order
+    return [results[i] for i in sorted(results) if results[i]]
+
+
+def _split_one(ffmpeg: str, video_file: str, ch: dict, i: int, output_path: Path) -> str | None:
+    """Stream-copy a single chapter. Returns the output path or None on failure."""
+    chapter_title = ch.get("title", f"Chapter {i+1}")
+    start = ch.get("start_time", 0)
+    end = ch.get("end_time", 0)
+
+    output_path = str(output_path)
+    emit_log("info", f"Splitting chapter {i+1}: {chapter_title}")
+
+    cmd = [
+        ffmpeg, "-y",
+        "-i", video_file,
+        "-ss", str(start),
+        "-to", str(end),
+        "-c", "copy",
+        "-movflags", "+faststart",
+        output_path,
+    ]
+
+    try:
+        proc = subprocess.run(
+            cmd, capture_output=True, text=True,
+            timeout=120, env=get_env()
+        )
+        if proc.returncode == 0:
+            return output_path
+        emit_log("warning", f"Failed to split chapter: {chapter_title}")
+    except subprocess.TimeoutExpired:
+        emit_log("warning", f"Chapter split timed out: {chapter_title}")
+    return None
+
+
 def main():
     if len(sys.argv) < 2:
         emit_error("usage", "Usage: python -m python.chapters split ...")
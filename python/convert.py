@@ -8,21 +8,65 @@ Usage:
   python -m python.convert merge --video FILE --audio FILE --output FILE
 """
 
+import functools
+import json
 import re
 import subprocess
 import sys
+import threading
+import time
+from collections import deque
 
 from python.protocol import emit_result, emit_error, emit_log, emit_progress
 from python.models import BITRATE_PRESETS
-from python.exec_resolve import find_ffmpeg, get_env
+from python.exec_resolve import find_ffmpeg, find_ffprobe, get_env
 
 
-def detect_resolution(video_file: str) -> tuple[int, int]:
+# ffmpeg banner patterns (fallback when ffprobe is unavailable)
+_DUR_RE = re.compile(r"Duration:\s+(\d{2}):(\d{2}):(\d{2})\.(\d{2})")
+_WXH_RE = re.compile(r"(\d{3,4})x(\d{3,4})")
+
+# Video encoder rows in `ffmpeg -encoders` output, e.g. " V....D libx264  ..."
+_ENCODER_RE = re.compile(r"^\s*V[.A-Z]+\s+(\S+)", re.MULTILINE)
+
+# Minimum seconds between progress events during an encode
+PROGRESS_INTERVAL = 0.1
+# While the percent is flat (or duration unknown), still report fps this often
+PROGRESS_HEARTBEAT = 1.0
+
+# Built-in preset heights, highest first
+_BITRATE_PRESET_KEYS_DESC = sorted(BITRATE_PRESETS, reverse=True)
+
+
+def _probe(video_file: str) -> tuple[int, int, float]:
     """
-    Detect actual source resolution using ffmpeg stderr.
-    Returns (width, height).
+    Probe source resolution and duration in a single subprocess.
+    Uses ffprobe JSON when available, otherwise parses the ffmpeg banner.
+    Returns (width, height, duration); unknown values are 0.
     """
+    ffprobe = find_ffprobe()
+    if ffprobe:
+        try:
+            proc = subprocess.run(
+                [ffprobe, "-v", "error", "-select_streams", "v:0",
+                 "-show_entries", "stream=width,height:format=duration",
+                 "-of", "json", video_file],
+                capture_output=True, text=True, timeout=10
+            )
+            if proc.returncode == 0:
+                data = json.loads(proc.stdout)
+                streams = data.get("streams") or [{}]
+                return (
+                    int(streams[0].get("width") or 0),
+                    int(streams[0].get("height") or 0),
+                    float((data.get("format") or {}).get("duration") or 0),
+                )
+        except Exception:
+            pass
+
     ffmpeg = find_ffmpeg()
+    width = height = 0
+    duration = 0.0
     try:
         proc = subprocess.run(
             [ffmpeg, "-i", video_file],
@@ -30,12 +74,25 @@ def detect_resolution(video_file: str) -> tuple[int, int]:
         )
         stderr = proc.stderr
         # Parse: "Video: ... WIDTHxHEIGHT" or "WIDTHxHEIGHT [SAR"
-        m = re.search(r"(\d{3,4})x(\d{3,4})", stderr)
+        m = _WXH_RE.search(stderr)
+        if m:
+            width, height = int(m.group(1)), int(m.group(2))
+        m = _DUR_RE.search(stderr)
         if m:
-            return int(m.group(1)), int(m.group(2))
+            h = int(m.group(1))
+            min_ = int(m.group(2))
+            s = int(m.group(3))
+            cs = int(m.group(4))
+            duration = h * 3600 + min_ * 60 + s + cs / 100.0
     except Exception:
         pass
-    return 0, 0
+    return width, height, duration
+
+
+def detect_resolution(video_file: str) -> tuple[int, int]:
+    """Detect actual source resolution. Returns (width, height)."""
+    width, height, _ = _probe(video_file)
+    return width, height
 
 
 def _get_bitrate_args(
@@ -63,7 +120,8 @@ def _get_bitrate_args(
 
     if bitrate_mode == "per-resolution" and per_res_bitrates:
         # Find closest user-defined preset
-        for preset_h in sorted(per_res_bitrates.keys(), reverse=True):
+        preset_heights = sorted(per_res_bitrates, reverse=True)
+        for preset_h in preset_heights:
             if height >= preset_h:
                 mbps = per_res_bitrates[preset_h]
                 br = f"{mbps}M"
@@ -71,7 +129,7 @@ def _get_bitrate_args(
                 buf = f"{mbps * 2}M"
                 return ["-b:v", br, "-maxrate", maxr, "-bufsize", buf]
         # Use the lowest tier
-        lowest = min(per_res_bitrates.keys())
+        lowest = preset_heights[-1]
         mbps = per_res_bitrates[lowest]
         br = f"{mbps}M"
         maxr = f"{int(mbps * 1.15)}M"
@@ -79,7 +137,7 @@ def _get_bitrate_args(
         return ["-b:v", br, "-maxrate", maxr, "-bufsize", buf]
 
     # Fallback: use built-in presets (per-resolution without custom values)
-    for preset_h in sorted(BITRATE_PRESETS.keys(), reverse=True):
+    for preset_h in _BITRATE_PRESET_KEYS_DESC:
         if height >= preset_h:
             bp = BITRATE_PRESETS[preset_h]
             return ["-b:v", bp["bitrate"], "-maxrate", bp["maxrate"], "-bufsize", bp["bufsize"]]
@@ -88,49 +146,65 @@ def _get_bitrate_args(
     return ["-b:v", bp["bitrate"], "-maxrate", bp["maxrate"], "-bufsize", bp["bufsize"]]
 
 
-def _parse_ffmpeg_progress(line: str, total_duration: float) -> dict | None:
-    """Parse ffmpeg stderr progress line."""
-    # frame=  123 fps= 45 ... time=00:01:23.45 ...
-    time_match = re.search(r"time=(\d{2}):(\d{2}):(\d{2})\.(\d{2})", line)
-    fps_match = re.search(r"fps=\s*(\d+\.?\d*)", line)
+@functools.cache
+def _available_encoders() -> frozenset[str] | None:
+    """
+    List the video encoders compiled into ffmpeg, once per process.
+    Returns None if ffmpeg couldn't be queried.
+    """
+    try:
+        proc = subprocess.run(
+            [find_ffmpeg(), "-hide_banner", "-encoders"],
+            capture_output=True, text=True, timeout=10
+        )
+    except Exception:
+        return None
+    if proc.returncode != 0:
+        return None
+    return frozenset(_ENCODER_RE.findall(proc.stdout))
+
+
+def read_ffmpeg_progress(stream, total_duration: float):
+    """
+    Yield progress dicts from ffmpeg `-progress pipe:1` output.
+    ffmpeg writes one key=value pair per line and closes each update
+    with a progress=continue|end line.
+    """
+    state = {}
+    for line in stream:
+        key, _, value = line.strip().partition("=")
+        if key != "progress":
+            state[key] = value
+            continue
 
-    if time_match:
-        h = int(time_match.group(1))
-        m = int(time_match.group(2))
-        s = int(time_match.group(3))
-        cs = int(time_match.group(4))
-        current_time = h * 3600 + m * 60 + s + cs / 100.0
+        try:
+            current_time = int(state.get("out_time_us", 0)) / 1_000_000
+        except ValueError:
+            continue  # N/A before the first frame is muxed
 
         percent = 0.0
         if total_duration > 0:
             percent = min((current_time / total_duration) * 100.0, 100.0)
 
-        fps = 0.0
-        if fps_match:
-            fps = float(fps_match.group(1))
+        try:
+            fps = float(state.get("fps", 0))
+        except ValueError:
+            fps = 0.0
+
+        yield {"percent": percent, "fps": fps, "current_time": current_time}
+
 
-        return {"percent": percent, "fps": fps, "current_time": current_time}
-    return None
+def drain_stderr(proc: subprocess.Popen, maxlen: int = 20) -> tuple[threading.Thread, deque]:
+    """Read a child's stderr on a background thread so the pipe never fills up."""
+    tail = deque(maxlen=maxlen)
+    t = threading.Thread(target=tail.extend, args=(proc.stderr,), daemon=True)
+    t.start()
+    return t, tail
 
 
 def _get_duration(video_file: str) -> float:
-    """Get video duration using ffmpeg."""
-    ffmpeg = find_ffmpeg()
-    try:
-        proc = subprocess.run(
-            [ffmpeg, "-i", video_file],
-            capture_output=True, text=True, timeout=15
-        )
-        m = re.search(r"Duration:\s+(\d{2}):(\d{2}):(\d{2})\.(\d{2})", proc.stderr)
-        if m:
-            h = int(m.group(1))
-            min_ = int(m.group(2))
-            s = int(m.group(3))
-            cs = int(m.group(4))
-            return h * 3600 + min_ * 60 + s + cs / 100.0
-    except Exception:
-        pass
-    return 0.0
+    """Get video duration in seconds."""
+    return _probe(video_file)[2]
 
 
 def merge_and_encode(
@@ -148,8 +222,7 @@ def merge_and_encode(
     Returns True on success.
     """
     ffmpeg = find_ffmpeg()
-    width, height = detect_resolution(video_file)
-    total_duration = _get_duration(video_file)
+    width, height, total_duration = _probe(video_file)
 
     emit_log("info", f"Source resolution: {width}x{height}")
 
@@ -157,10 +230,18 @@ def merge_and_encode(
     if bitrate_mode != "auto":
         emit_log("info", f"Bitrate mode: {bitrate_mode}")
 
-    # Try VideoToolbox first, then fall back to libx264
-    for encoder in ["h264_videotoolbox", "libx264"]:
+    # Try VideoToolbox first, then fall back to libx264. Skip VideoToolbox
+    # outright when this ffmpeg build doesn't include it.
+    encoders = ["h264_videotoolbox", "libx264"]
+    available = _available_encoders()
+    if available is not None and "h264_videotoolbox" not in available:
+        emit_log("info", "VideoToolbox encoder not available in this ffmpeg build")
+        encoders = ["libx264"]
+
+    for encoder in encoders:
         cmd = [
             ffmpeg, "-y",
+            "-nostats", "-progress", "pipe:1",
             "-i", video_file,
             "-i", audio_file,
             "-c:v", encoder,
@@ -195,29 +276,46 @@ def merge_and_encode(
                 env=get_env(),
             )
 
-            # Parse progress from stderr
-            for line in proc.stderr:
-                line = line.strip()
-                if not line:
+            stderr_thread, stderr_tail = drain_stderr(proc)
+
+            # Parse progress from the -progress key=value stream, emitting at
+            # most every PROGRESS_INTERVAL seconds: on a visible percent
+            # change, or as a PROGRESS_HEARTBEAT when the percent stalls.
+            # The last value seen is always sent when the stream ends.
+            last_emit = 0.0
+            last_pct = -1.0
+            pending = None
+            for progress in read_ffmpeg_progress(proc.stdout, total_duration):
+                overall = stage_offset + (progress["percent"] / 100.0) * stage_weight
+                fps = progress.get("fps", 0)
+                now = time.monotonic()
+                elapsed = now - last_emit
+                if elapsed < PROGRESS_INTERVAL or (
+                    abs(overall - last_pct) < 0.1 and elapsed < PROGRESS_HEARTBEAT
+                ):
+                    pending = (overall, fps)
                     continue
+                last_emit = now
+                last_pct = overall
+                pending = None
+                emit_progress("convert", overall, fps=fps)
 
-                progress = _parse_ffmpeg_progress(line, total_duration)
-                if progress:
-                    overall = stage_offset + (progress["percent"] / 100.0) * stage_weight
-                    emit_progress("convert", overall, fps=progress.get("fps", 0))
+            if pending:
+                emit_progress("convert", pending[0], fps=pending[1])
 
             proc.wait(timeout=3600)  # 1 hour timeout for long videos
+            stderr_thread.join(timeout=5)
 
             if proc.returncode == 0:
                 emit_log("info", f"Encoding complete with {encoder}")
                 return True
 
-            stderr_out = proc.stderr.read() if proc.stderr else ""
+            stderr_out = "".join(stderr_tail).strip()
             if encoder == "h264_videotoolbox":
                 emit_log("warning", f"VideoToolbox failed, falling back to libx264...")
                 continue
             else:
-                emit_error("conversion_error", f"FFmpeg encoding failed: {stderr_out[:200]}")
+                emit_error("conversion_error", f"FFmpeg encoding failed: {stderr_out[-200:]}")
                 return False
 
         except subprocess.TimeoutExpired:
@@ -242,7 +340,6 @@ def main():
 
     if sys.argv[1] == "merge":
         import argparse
-        import json as _json
         parser = argparse.ArgumentParser()
         parser.add_argument("merge")
         parser.add_argument("--video", required=True)
@@ -256,7 +353,7 @@ def main():
         per_res = None
         if args.per_res_bitrates:
             try:
-                per_res = {int(k): int(v) for k, v in _json.loads(args.per_res_bitrates).items()}
+                per_res = {int(k): int(v) for k, v in json.loads(args.per_res_bitrates).items()}
             except Exception:
                 pass
 
@@ -2,7 +2,7 @@
 Browser cookie detection and testing module.
 
 Detects installed browsers and profiles on macOS.
-Tests cookie health by attempting to fetch video info.
+Tests cookie health by checking YouTube reports a signed-in session.
 
 Usage:
   python -m python.cookies detect
@@ -10,11 +10,14 @@ Usage:
 """
 
 import configparser
+import hashlib
 import json
 import os
 import subprocess
 import sys
 from pathlib import Path
+from urllib.error import URLError
+from urllib.request import HTTPCookieProcessor, Request, build_opener
 
 from python.protocol import emit_result, emit_error, emit_log
 from python.exec_resolve import build_ytdlp_cmd, get_env
@@ -27,13 +30,75 @@ BROWSER_PATHS = {
     "edge": Path.home() / "Library" / "Application Support" / "Microsoft Edge",
     "safari": Path.home() / "Library" / "Safari",
 }
+FIREFOX_PROFILES_INI = Path.home() / "Library" / "Application Support" / "Firefox" / "profiles.ini"
+
+# Cookie test: a signed-in-only page and the flag YouTube embeds in its config
+COOKIE_TEST_URL = "https://www.youtube.com/feed/library"
+SIGNED_IN_MARKER = b'"LOGGED_IN":true'
+COOKIE_TEST_MAX_BYTES = 1024 * 1024
+YOUTUBE_AUTH_COOKIES = frozenset({"SAPISID", "__Secure-3PAPISID", "SID", "__Secure-3PSID"})
+
+# Detection results, keyed by a hash of the state paths' mtimes
+CACHE_FILE = Path.home() / ".cache" / "media-pull" / "browsers.json"
+_STATE_PATHS = (
+    *BROWSER_PATHS.values(),
+    BROWSER_PATHS["chrome"] / "Local State",
+    BROWSER_PATHS["edge"] / "Local State",
+    FIREFOX_PROFILES_INI,
+)
 
 
 def detect_browsers() -> list[dict]:
     """
     Detect installed browsers and their profiles.
     Returns list of {browser, profiles: [{name, path, is_default}]}
+    Results are cached on disk until one of the browser state files changes.
     """
+    fingerprint = _state_fingerprint()
+    cached = _read_cache(fingerprint)
+    if cached is not None:
+        return cached
+
+    results = _scan_browsers()
+    _write_cache(fingerprint, results)
+    return results
+
+
+def _state_fingerprint() -> str:
+    """Hash the mtimes of every file and directory detection depends on."""
+    h = hashlib.blake2b(digest_size=16)
+    for path in _STATE_PATHS:
+        try:
+            mtime = path.stat().st_mtime_ns
+        except OSError:
+            mtime = -1
+        h.update(f"{path}\0{mtime}\n".encode())
+    return h.hexdigest()
+
+
+def _read_cache(fingerprint: str) -> list[dict] | None:
+    """Return cached detection results if they match the current fingerprint."""
+    try:
+        with open(CACHE_FILE) as f:
+            data = json.load(f)
+        if data.get("hash") == fingerprint:
+            return data["browsers"]
+    except (OSError, json.JSONDecodeError, KeyError, AttributeError):
+        pass
+    return None
+
+
+def _write_cache(fingerprint: str, browsers: list[dict]):
+    try:
+        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(CACHE_FILE, "w") as f:
+            json.dump({"hash": fingerprint, "browsers": browsers}, f)
+    except OSError:
+        pass  # Cache is an optimisation only
+
+
+def _scan_browsers() -> list[dict]:
+    """Walk the browser directories and collect profiles."""
     results = []
 
     # Chrome
@@ -93,9 +158,10 @@ def _detect_chrome_profiles(browser_dir: Path) -> list[dict]:
     if not profiles:
         if (browser_dir / "Default").exists():
             profiles.append({"name": "Default", "path": "Default", "is_default": True})
-        for d in browser_dir.iterdir():
-            if d.is_dir() and d.name.startswith("Profile "):
-                profiles.append({"name": d.name, "path": d.name, "is_default": False})
+        with os.scandir(browser_dir) as it:
+            for d in it:
+                if d.name.startswith("Profile ") and d.is_dir(follow_symlinks=False):
+                    profiles.append({"name": d.name, "path": d.name, "is_default": False})
 
     return profiles
 
@@ -103,13 +169,12 @@ def _detect_chrome_profiles(browser_dir: Path) -> list[dict]:
 def _detect_firefox_profiles() -> list[dict]:
     """Detect Firefox profiles by parsing profiles.ini."""
     profiles = []
-    profiles_ini = Path.home() / "Library" / "Application Support" / "Firefox" / "profiles.ini"
 
-    if not profiles_ini.exists():
+    if not FIREFOX_PROFILES_INI.exists():
         return profiles
 
     config = configparser.ConfigParser()
-    config.read(str(profiles_ini))
+    config.read(str(FIREFOX_PROFILES_INI))
 
     for section in config.sections():
         if not section.startswith("Profile"):
@@ -131,8 +196,72 @@ def _detect_firefox_profiles() -> list[dict]:
 def test_cookies(browser: str, profile: str) -> dict:
     """
     Test if cookies from the specified browser/profile work.
-    Attempts to fetch info for a known video.
+    Loads the browser cookies in-process and checks that YouTube reports a
+    signed-in session. Falls back to a full yt-dlp fetch when the yt_dlp
+    module isn't importable.
     """
+    result = _test_cookies_http(browser, profile)
+    if result is not None:
+        return result
+    return _test_cookies_ytdlp(browser, profile)
+
+
+def _test_cookies_http(browser: str, profile: str) -> dict | None:
+    """
+    Send the browser's cookies to a YouTube page and look for the signed-in flag.
+    Returns None if yt_dlp isn't available in this interpreter.
+    """
+    try:
+        from yt_dlp.cookies import extract_cookies_from_browser
+    except ImportError:
+        return None
+
+    try:
+        jar = extract_cookies_from_browser(browser, profile or None)
+    except Exception:
+        return {
+            "success": False,
+            "message": "Cookie test failed. Make sure the browser is fully closed (Cmd+Q) and you're signed in.",
+        }
+
+    if not any(c.name in YOUTUBE_AUTH_COOKIES and c.domain.endswith("youtube.com") for c in jar):
+        return {
+            "success": False,
+            "message": "No YouTube login found in this browser profile. Sign in to YouTube and try again.",
+        }
+
+    try:
+        opener = build_opener(HTTPCookieProcessor(jar))
+        req = Request(COOKIE_TEST_URL, headers={"User-Agent": "Mozilla/5.0"})
+        with opener.open(req, timeout=10) as resp:
+            signed_in = False
+            read = 0
+            tail = b""
+            while read < COOKIE_TEST_MAX_BYTES:
+                chunk = resp.read(65536)
+                if not chunk:
+                    break
+                read += len(chunk)
+                if SIGNED_IN_MARKER in tail + chunk:
+                    signed_in = True
+                    break
+                tail = chunk[-len(SIGNED_IN_MARKER):]
+    except (URLError, OSError) as e:
+        return {
+            "success": False,
+            "message": f"Error: {e}",
+        }
+
+    if signed_in:
+        return {"success": True, "message": "Cookies working! Signed in to YouTube."}
+    return {
+        "success": False,
+        "message": "Cookie test failed. Make sure the browser is fully closed (Cmd+Q) and you're signed in.",
+    }
+
+
+def _test_cookies_ytdlp(browser: str, profile: str) -> dict:
+    """Test cookies by running yt-dlp -J on a known video."""
     cookie_str = browser
     if profile:
         cookie_str += f":{profile}"
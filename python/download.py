@@ -4,35 +4,68 @@ Download module: video + audio stream downloads with retry system.
 Usage:
   python -m python.download run --url URL --quality QUALITY --output-dir DIR [options]
 
-The full pipeline: download_video → download_audio → convert → sponsorblock
+The full pipeline: (download_video ∥ download_audio) → convert → sponsorblock
 """
 
 import argparse
+import functools
 import os
+import random
 import re
 import subprocess
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 from python.protocol import emit_result, emit_error, emit_log, emit_progress
 from python.models import FORMAT_SELECTORS, BITRATE_PRESETS
-from python.errors import classify_error, DownloadError
+from python.errors import classify_error, DownloadError, FormatUnavailableError
 from python.exec_resolve import build_ytdlp_cmd, get_env
 from python.utils import sanitize_filename, find_temp_file, parse_youtube_url, unique_filepath
 
 
-# Retry configuration
+# Retry configuration: full-jitter exponential backoff,
+# delay = uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
 MAX_ATTEMPTS = 6
-RETRY_DELAYS = [10, 20, 30, 45, 60]
+RETRY_BASE_DELAY = 5.0
+RETRY_MAX_DELAY = 60.0
 SILENT_RETRIES = 2
+RETRY_COUNTDOWN_STEP = 5  # seconds between countdown updates while waiting
 
+# Progress throttling: emit on >= PROGRESS_MIN_STEP percent or PROGRESS_INTERVAL seconds
+PROGRESS_MIN_STEP = 0.5
+PROGRESS_INTERVAL = 0.2
 
-def _get_format_selector(quality: str, attempt: int = 0, last_format_id: str = None) -> str:
+# yt-dlp output patterns (bytes: stdout is read undecoded)
+# [download]  42.5% of 1.23GiB at 12.3MiB/s ETA 01:24
+_RE_PROGRESS = re.compile(rb"\[download\]\s+(\d+\.?\d*)%\s+of\s+~?(\S+)\s+at\s+(\S+)\s+ETA\s+(\S+)")
+_RE_SPEED = re.compile(rb"([\d.]+)(Ki|Mi|Gi)?B/s")
+_RE_SIZE = re.compile(rb"([\d.]+)(Ki|Mi|Gi)?B")
+_SIZE_UNITS = {None: 1, b"Ki": 1 << 10, b"Mi": 1 << 20, b"Gi": 1 << 30}
+# Emitted by our own --print after_move template, so no second yt-dlp run is needed for the title
+_TITLE_MARKER = "__mediapull_title__:"
+_RE_TITLE = re.compile(re.escape(_TITLE_MARKER.encode()) + rb"(.*)")
+
+
+def _retry_delay(attempt: int) -> float:
+    """Full-jitter backoff so concurrent clients don't retry in lockstep."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** (attempt - 1))))
+
+
+@functools.lru_cache(maxsize=16)
+def _format_selector(kind: str, height: int) -> str:
+    """FORMAT_SELECTORS[kind] filled in for a height; only a few heights occur."""
+    return FORMAT_SELECTORS[kind].format(h=height)
+
+
+def _get_format_selector(quality: str) -> str:
     """
     Build format selector string based on quality.
     For 4K+: resolution-first. For <=1080p: prefer H.264.
-    After first failure with specific format, switch to generic.
+    Each selector is a '/'-separated fallback chain ending in the catch-all
+    bv*, so yt-dlp falls back in-process instead of us retrying.
     """
     try:
         height = int(quality.replace("p", "").replace("k", "").replace("K", ""))
@@ -43,20 +76,12 @@ def _get_format_selector(quality: str, attempt: int = 0, last_format_id: str = N
 
     if height >= 1440:
         return FORMAT_SELECTORS["resolution_first"]
-    else:
-        if attempt > 0 and last_format_id:
-            # After first failure, use generic selector
-            return FORMAT_SELECTORS["generic"].format(h=height)
-        return FORMAT_SELECTORS["h264_pref"].format(h=height)
-
-
-def _parse_progress(line: str) -> dict | None:
-    """Parse yt-dlp progress output line."""
-    # [download]  42.5% of 1.23GiB at 12.3MiB/s ETA 01:24
-    m = re.search(
-        r"\[download\]\s+(\d+\.?\d*)%\s+of\s+~?(\S+)\s+at\s+(\S+)\s+ETA\s+(\S+)",
-        line
-    )
+    return _format_selector("h264_pref", height)
+
+
+def _parse_progress(line: bytes) -> dict | None:
+    """Parse yt-dlp progress output line. float()/int() accept the byte groups directly."""
+    m = _RE_PROGRESS.search(line)
     if m:
         percent = float(m.group(1))
         speed_str = m.group(3)
@@ -64,22 +89,22 @@ def _parse_progress(line: str) -> dict | None:
 
         # Parse speed
         speed_mbps = 0.0
-        sm = re.match(r"([\d.]+)(Ki|Mi|Gi)?B/s", speed_str)
+        sm = _RE_SPEED.match(speed_str)
         if sm:
             val = float(sm.group(1))
-            unit = sm.group(2) or ""
-            if unit == "Gi":
+            unit = sm.group(2)
+            if unit == b"Gi":
                 speed_mbps = val * 1024
-            elif unit == "Mi":
+            elif unit == b"Mi":
                 speed_mbps = val
-            elif unit == "Ki":
+            elif unit == b"Ki":
                 speed_mbps = val / 1024
             else:
                 speed_mbps = val / (1024 * 1024)
 
         # Parse ETA
         eta_secs = 0.0
-        parts = eta_str.split(":")
+        parts = eta_str.split(b":")
         try:
             if len(parts) == 3:
                 eta_secs = int(parts[0]) * 3600 + int(parts[1]) * 60 + int(parts[2])
@@ -88,14 +113,61 @@ def _parse_progress(line: str) -> dict | None:
         except ValueError:
             pass
 
+        # Parse total size (yt-dlp prefixes estimates with ~)
+        total_bytes = 0.0
+        zm = _RE_SIZE.match(m.group(2))
+        if zm:
+            total_bytes = float(zm.group(1)) * _SIZE_UNITS[zm.group(2)]
+
         return {
             "percent": percent,
             "speed_mbps": speed_mbps,
             "eta_seconds": eta_secs,
+            "total_bytes": total_bytes,
         }
     return None
 
 
+class _CombinedProgress:
+    """
+    Merge the progress of streams downloading at the same time into one
+    stage whose percent only ever goes up. Each stream counts in proportion
+    to its total size once every size is known, and by its nominal weight
+    until then.
+    """
+
+    def __init__(self, stage: str, offset: float, weight: float, stream_weights: dict[str, float]):
+        self.stage = stage
+        self._offset = offset
+        self._weight = weight
+        self._lock = threading.Lock()
+        self._weights = stream_weights
+        self._percent = dict.fromkeys(stream_weights, 0.0)
+        self._total = dict.fromkeys(stream_weights, 0.0)
+        self._speed = dict.fromkeys(stream_weights, 0.0)
+        self._eta = dict.fromkeys(stream_weights, 0.0)
+        self._overall = offset
+
+    def update(self, stream: str, percent: float, total_bytes: float, speed_mbps: float, eta_seconds: float):
+        with self._lock:
+            self._percent[stream] = percent
+            if total_bytes > 0:
+                self._total[stream] = total_bytes
+            self._speed[stream] = speed_mbps
+            self._eta[stream] = eta_seconds
+
+            weights = self._total if all(self._total.values()) else self._weights
+            fraction = sum(self._percent[k] / 100.0 * w for k, w in weights.items()) / sum(weights.values())
+            self._overall = max(self._overall, self._offset + fraction * self._weight)
+            emit_progress(self.stage, self._overall, sum(self._speed.values()), max(self._eta.values()))
+
+    def retry(self, stream: str, remaining: float):
+        """Countdown while one stream waits to retry; the bar holds its position."""
+        with self._lock:
+            self._speed[stream] = 0.0
+            emit_progress(f"{self.stage}_retry", self._overall, speed_mbps=0, eta_seconds=remaining)
+
+
 def download_stream(
     url: str,
     format_selector: str,
@@ -107,43 +179,57 @@ def download_stream(
     trim_end: str = None,
     cookies_browser: str = None,
     cookies_profile: str = None,
+    info: dict | None = None,
+    cancel: threading.Event | None = None,
+    combined: _CombinedProgress | None = None,
 ) -> str | None:
     """
     Download a single stream (video or audio) with retry system.
     Returns the output file path or None on failure.
+    If info is given, the video title is stored in info["title"].
+    If cancel is set (e.g. the sibling stream failed), gives up quietly.
+    If combined is given, progress is reported through it under `stage` as
+    the stream key instead of as a stage of its own.
     """
-    last_format_id = None
+    cancel = cancel or threading.Event()
 
     for attempt in range(MAX_ATTEMPTS):
+        if cancel.is_set():
+            return None
+
         if attempt > 0:
-            delay = RETRY_DELAYS[min(attempt - 1, len(RETRY_DELAYS) - 1)]
+            delay = _retry_delay(attempt)
             is_silent = attempt <= SILENT_RETRIES
 
             if not is_silent:
-                emit_log("warning", f"Retry {attempt}/{MAX_ATTEMPTS-1} in {delay}s...")
+                emit_log("warning", f"Retry {attempt}/{MAX_ATTEMPTS-1} in {delay:.0f}s...")
             else:
-                emit_log("debug", f"Retry {attempt} in {delay}s...")
-
-            # Countdown progress during wait
-            for remaining in range(delay, 0, -1):
-                emit_progress(f"{stage}_retry", stage_offset, speed_mbps=0, eta_seconds=remaining)
-                time.sleep(1)
-
-        # Build format selector (may switch to generic after failures)
-        current_selector = format_selector
-        if attempt > 0 and last_format_id:
-            # For 4K, switch to generic after first failure
-            m = re.search(r"\d{3,4}", format_selector)
-            if m and int(m.group()) >= 1440:
-                current_selector = FORMAT_SELECTORS["resolution_first"]
+                emit_log("debug", f"Retry {attempt} in {delay:.0f}s...")
+
+            # Countdown progress during wait, one update per step
+            remaining = delay
+            while remaining > 0:
+                if combined is not None:
+                    combined.retry(stage, remaining)
+                else:
+                    emit_progress(f"{stage}_retry", stage_offset, speed_mbps=0, eta_seconds=remaining)
+                step = min(RETRY_COUNTDOWN_STEP, remaining)
+                if cancel.wait(step):
+                    return None
+                remaining -= step
 
         args = [
-            "-f", current_selector,
+            "-f", format_selector,
             "-o", output_template,
             "--no-continue",
             "--force-overwrites",
             "--no-playlist",
             "--no-mtime",
+            # --print implies --quiet unless overridden; keep progress on stdout
+            "--print", f"after_move:{_TITLE_MARKER}%(title)s",
+            "--no-quiet",
+            # One progress update per line; stdout is split on \n only in bytes mode
+            "--newline",
         ]
 
         # Trim support
@@ -167,40 +253,71 @@ def download_stream(
                 cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
                 env=get_env(),
             )
 
-            # Stream progress from stdout
+            # Drain stderr concurrently so a chatty yt-dlp can't fill the
+            # pipe buffer and block while we're reading stdout
+            stderr_chunks = []
+            stderr_thread = threading.Thread(
+                target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True
+            )
+            stderr_thread.start()
+
+            # Stream progress from stdout. Lines are raw bytes and aren't
+            # stripped: the patterns ignore the surrounding whitespace.
+            last_pct = -PROGRESS_MIN_STEP
+            last_emit = 0.0
             for line in proc.stdout:
-                line = line.strip()
-                if not line:
-                    continue
+                if cancel.is_set():
+                    proc.kill()
+                    break
 
                 progress = _parse_progress(line)
                 if progress:
-                    # Map 0-100% to stage range
-                    overall = stage_offset + (progress["percent"] / 100.0) * stage_weight
-                    emit_progress(stage, overall, progress["speed_mbps"], progress["eta_seconds"])
-
-                # Extract format ID for retry fallback
-                m = re.search(r"Downloading format (\S+)", line)
-                if m:
-                    last_format_id = m.group(1)
+                    pct = progress["percent"]
+                    now = time.monotonic()
+                    if (pct - last_pct >= PROGRESS_MIN_STEP or pct >= 100.0
+                            or now - last_emit >= PROGRESS_INTERVAL):
+                        last_pct, last_emit = pct, now
+                        if combined is not None:
+                            combined.update(
+                                stage, pct, progress["total_bytes"],
+                                progress["speed_mbps"], progress["eta_seconds"],
+                            )
+                        else:
+                            # Map 0-100% to stage range
+                            overall = stage_offset + (pct / 100.0) * stage_weight
+                            emit_progress(stage, overall, progress["speed_mbps"], progress["eta_seconds"])
+
+                if info is not None:
+                    m = _RE_TITLE.match(line)
+                    if m:
+                        info["title"] = m.group(1).strip().decode("utf-8", "replace")
 
             proc.wait(timeout=300)
-            stderr = proc.stderr.read()
+            stderr_thread.join()
+            stderr = b"".join(stderr_chunks).decode("utf-8", "replace")
+
+            if cancel.is_set():
+                return None
 
             if proc.returncode == 0:
                 # Find the output file
                 output_dir = str(Path(output_template).parent)
-                video_id = parse_youtube_url(url).get("video_id", "")
+                video_id = parse_youtube_url(url).video_id or ""
 
-                # Check for the file
+                # Check for the file (only prefix matches get stat'd)
                 stem = Path(output_template).stem.split(".")[0]
-                for f in Path(output_dir).iterdir():
-                    if stem in f.name and f.stat().st_size > 1024:
-                        return str(f)
+                with os.scandir(output_dir) as it:
+                    for e in it:
+                        if not e.name.startswith(stem):
+                            continue
+                        try:
+                            if e.is_file() and e.stat().st_size > 1024:
+                                return e.path
+                        except FileNotFoundError:
+                            continue
 
                 # Broader search
                 found = find_temp_file(output_dir, video_id)
@@ -210,8 +327,12 @@ def download_stream(
                 emit_log("warning", "Download reported success but file not found, retrying...")
                 continue
 
-            # Non-zero exit — classify error
+            # Non-zero exit — classify error. The selector chain already
+            # covered every acceptable format, so retrying can't help.
             err = classify_error(stderr)
+            if isinstance(err, FormatUnavailableError):
+                emit_error(err.code, err.message)
+                return None
             if attempt < MAX_ATTEMPTS - 1:
                 if attempt >= SILENT_RETRIES:
                     emit_log("warning", f"Download failed: {err.message}")
@@ -252,13 +373,13 @@ def run_pipeline(args):
             emit_error("chapters_error", "Invalid chapters JSON")
             return
 
-    parsed = parse_youtube_url(url)
-    video_id = parsed.get("video_id", "unknown")
+    video_id = parse_youtube_url(url).video_id or "unknown"
 
     os.makedirs(output_dir, exist_ok=True)
     temp_dir = output_dir
 
     emit_log("info", f"Starting download: {quality}")
+    info = {}  # filled with the title by download_stream
 
     if audio_only:
         # Audio-only download
@@ -275,13 +396,14 @@ def run_pipeline(args):
             trim_end=args.trim_end,
             cookies_browser=args.cookies_browser,
             cookies_profile=args.cookies_profile,
+            info=info,
         )
 
         if not audio_file:
             return
 
         # Get title for final filename
-        title = _fetch_title(url, args)
+        title = info.get("title") or _fetch_title(url, args)
         safe_title = sanitize_filename(title)
         ext = Path(audio_file).suffix
         final_path = unique_filepath(Path(output_dir) / f"{safe_title}{ext}")
@@ -295,63 +417,72 @@ def run_pipeline(args):
         return
 
     # Progress weights depend on whether we're splitting chapters
-    # Chapters: video(0-35) audio(35-55) convert(55-80) split(80-100)
-    # Normal:   video(0-40) audio(40-60) convert(60-85) sponsorblock(85-100)
+    # Chapters: download(0-55) convert(55-80) split(80-100)
+    # Normal:   download(0-60) convert(60-85) sponsorblock(85-100)
+    # Within download, video nominally counts for 35/40 and audio for 20
     if chapters:
-        VID_OFF, VID_WT = 0, 35
-        AUD_OFF, AUD_WT = 35, 20
+        VID_WT, AUD_WT = 35, 20
         CVT_OFF, CVT_WT = 55, 25
     else:
-        VID_OFF, VID_WT = 0, 40
-        AUD_OFF, AUD_WT = 40, 20
+        VID_WT, AUD_WT = 40, 20
         CVT_OFF, CVT_WT = 60, 25
 
-    # Video download pipeline
-    # Stage 1: Download video
-    emit_log("info", "Downloading video stream...")
+    # Stages 1+2: Download video and audio concurrently. They're independent
+    # HTTPS fetches; progress is merged into one "download" stage so the
+    # single progress bar doesn't jump between the two ranges.
+    emit_log("info", "Downloading video and audio streams...")
     video_selector = _get_format_selector(quality)
     video_template = os.path.join(temp_dir, f"{video_id}_temp_video.%(ext)s")
-
-    video_file = download_stream(
-        url=url,
-        format_selector=video_selector,
-        output_template=video_template,
-        stage="download_video",
-        stage_offset=VID_OFF,
-        stage_weight=VID_WT,
-        trim_start=args.trim_start,
-        trim_end=args.trim_end,
-        cookies_browser=args.cookies_browser,
-        cookies_profile=args.cookies_profile,
-    )
-
-    if not video_file:
-        return
-
-    # Stage 2: Download audio
-    emit_log("info", "Downloading audio stream...")
     audio_template = os.path.join(temp_dir, f"{video_id}_temp_audio.%(ext)s")
 
-    audio_file = download_stream(
+    common = dict(
         url=url,
-        format_selector=FORMAT_SELECTORS["audio"],
-        output_template=audio_template,
-        stage="download_audio",
-        stage_offset=AUD_OFF,
-        stage_weight=AUD_WT,
         trim_start=args.trim_start,
         trim_end=args.trim_end,
         cookies_browser=args.cookies_browser,
         cookies_profile=args.cookies_profile,
+        info=info,
+        cancel=threading.Event(),
+        combined=_CombinedProgress(
+            "download", 0, VID_WT + AUD_WT,
+            {"download_video": VID_WT, "download_audio": AUD_WT},
+        ),
     )
-
-    if not audio_file:
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        video_future = pool.submit(
+            download_stream,
+            format_selector=video_selector,
+            output_template=video_template,
+            stage="download_video",
+            **common,
+        )
+        audio_future = pool.submit(
+            download_stream,
+            format_selector=FORMAT_SELECTORS["audio"],
+            output_template=audio_template,
+            stage="download_audio",
+            **common,
+        )
+        # If either stream fails there's nothing to merge; stop the other
+        for future in as_completed((video_future, audio_future)):
+            try:
+                failed = future.result() is None
+            except BaseException:
+                common["cancel"].set()
+                raise
+            if failed:
+                common["cancel"].set()
+
+    video_file = video_future.result()
+    audio_file = audio_future.result()
+
+    if not video_file or not audio_file:
         _cleanup_temp(temp_dir, video_id)
         return
 
     # Stage 3: Convert/merge
     emit_log("info", "Merging and encoding...")
-    title = _fetch_title(url, args)
+    title = info.get("title") or _fetch_title(url, args)
     safe_title = sanitize_filename(title)
     final_path = unique_filepath(Path(output_dir) / f"{safe_title}.mp4")
 
@@ -435,7 +566,7 @@ def run_pipeline(args):
 
 
 def _fetch_title(url: str, args) -> str:
-    """Quick title fetch for naming the output file."""
+    """Fallback title fetch when the download didn't report one."""
     cmd = build_ytdlp_cmd([
         "--get-title", "--no-playlist", url,
     ])
@@ -446,9 +577,10 @@ def _fetch_title(url: str, args) -> str:
         cmd.extend(["--cookies-from-browser", cookie_str])
 
     try:
-        proc = subprocess.run(cmd, capture_output=True, text=True, timeout=30, env=get_env())
-        if proc.returncode == 0 and proc.stdout.strip():
-            return proc.stdout.strip().split("\n")[0]
+        proc = subprocess.run(cmd, capture_output=True, timeout=30, env=get_env())
+        out = proc.stdout.strip()
+        if proc.returncode == 0 and out:
+            return out.split(b"\n")[0].decode("utf-8", "replace").strip()
     except Exception:
         pass
     return "video"
@@ -457,9 +589,13 @@ def _fetch_title(url: str, args) -> str:
 def _cleanup_temp(directory: str, video_id: str):
     """Remove temp files for a video ID."""
     try:
-        for f in Path(directory).iterdir():
-            if video_id in f.name and ("_temp_" in f.name or f.name.endswith(".part")):
-                f.unlink(missing_ok=True)
+        with os.scandir(directory) as it:
+            for e in it:
+                if video_id in e.name and ("_temp_" in e.name or e.name.endswith(".part")):
+                    try:
+                        os.unlink(e.path)
+                    except FileNotFoundError:
+                        pass
     except Exception:
         pass
 
@@ -2,6 +2,8 @@
 Custom error types and yt-dlp stderr error classifier.
 """
 
+import re
+
 
 class YtDlpError(Exception):
     """Base error for yt-dlp related failures."""
@@ -56,6 +58,14 @@ class UnviewablePlaylistError(YtDlpError):
         super().__init__(message or "This playlist is not accessible.")
 
 
+class FormatUnavailableError(YtDlpError):
+    """No format matched the selector chain."""
+    code = "format_unavailable"
+
+    def __init__(self, message: str = ""):
+        super().__init__(message or "No downloadable format is available for this video.")
+
+
 class DownloadError(YtDlpError):
     """Generic download failure (403, network, etc.)."""
     code = "download_error"
@@ -66,32 +76,63 @@ class ConversionError(YtDlpError):
     code = "conversion_error"
 
 
+# Every signature classify_error looks for, scanned in a single pass.
+# Values give the classification priority (lower wins).
+_ERR_SIGNATURES = {
+    "sign in to confirm your age": 0,
+    "age-restricted": 0,
+    "private video": 1,
+    "video unavailable": 2,
+    "this video has been removed": 2,
+    "this content is not available": 3,
+    "requires login": 4,
+    "unable to recognize playlist": 5,
+    "not a valid url": 5,
+    "requested format is not available": 6,
+    "http error 403": 7,
+    "forbidden": 7,
+    "http error 429": 8,
+    # "cookies" + "please" together also mean login is required
+    "cookies": None,
+    "please": None,
+}
+_ERR_RE = re.compile("|".join(re.escape(k) for k in _ERR_SIGNATURES), re.IGNORECASE)
+
+
 def classify_error(stderr: str) -> YtDlpError:
     """
     Parse yt-dlp stderr output and return the appropriate error type.
     This is critical for providing actionable error messages to users.
     """
-    stderr_lower = stderr.lower()
-
-    if "sign in to confirm your age" in stderr_lower or "age-restricted" in stderr_lower:
+    found = {m.group().lower() for m in _ERR_RE.finditer(stderr)}
+    priorities = {_ERR_SIGNATURES[k] for k in found}
+    if "cookies" in found and "please" in found:
+        priorities.add(4)
+    priorities.discard(None)
+    kind = min(priorities, default=None)
+
+    if kind == 0:
         return AgeRestrictedError()
 
-    if "private video" in stderr_lower:
+    if kind == 1:
         return PrivateVideoError()
 
-    if "video unavailable" in stderr_lower or "this video has been removed" in stderr_lower:
+    if kind == 2:
         return VideoUnavailableError()
 
-    if "this content is not available" in stderr_lower:
+    if kind == 3:
         return VideoUnavailableError("This video is not available in your region.")
 
-    if "requires login" in stderr_lower or "cookies" in stderr_lower and "please" in stderr_lower:
+    if kind == 4:
         return LoginRequiredError()
 
-    if "unable to recognize playlist" in stderr_lower or "not a valid url" in stderr_lower:
+    if kind == 5:
         return UnviewablePlaylistError()
 
-    if "http error 403" in stderr_lower or "forbidden" in stderr_lower:
+    if kind == 6:
+        return FormatUnavailableError()
+
+    if kind == 7:
         return DownloadError(
             "HTTP 403 Forbidden. YouTube is blocking the download. Try:\n"
             "1. Update yt-dlp to the latest version\n"
@@ -99,7 +140,7 @@ def classify_error(stderr: str) -> YtDlpError:
             "3. Wait a few minutes and try again"
         )
 
-    if "http error 429" in stderr_lower:
+    if kind == 8:
         return DownloadError(
             "Rate limited by YouTube. Wait a few minutes before trying again."
         )
@@ -9,9 +9,11 @@ Priority chain (highest to lowest):
 5. System PATH
 """
 
+import functools
 import os
 import shutil
-import subprocess
+import sys
+from importlib.util import find_spec
 from pathlib import Path
 
 APP_SUPPORT_DIR = Path.home() / "Library" / "Application Support" / "Media Pull"
@@ -26,9 +28,10 @@ def _find_in_path(name: str) -> str | None:
     return shutil.which(name)
 
 
+@functools.cache
 def find_ytdlp() -> tuple[str, str]:
     """
-    Find yt-dlp executable.
+    Find yt-dlp executable. Resolved once per process.
     Returns (command, mode) where mode is 'binary' or 'module'.
     """
     # 1. User-updated binary
@@ -41,16 +44,9 @@ def find_ytdlp() -> tuple[str, str]:
     if bundled and _is_executable(Path(bundled)):
         return bundled, "binary"
 
-    # 3. Python module
-    try:
-        result = subprocess.run(
-            ["python3", "-c", "import yt_dlp"],
-            capture_output=True, timeout=5
-        )
-        if result.returncode == 0:
-            return "python3", "module"
-    except (subprocess.SubprocessError, FileNotFoundError):
-        pass
+    # 3. Python module (spec lookup only; avoids importing yt_dlp)
+    if find_spec("yt_dlp") is not None:
+        return sys.executable, "module"
 
     # 4. Homebrew
     for prefix in ["/opt/homebrew/bin", "/usr/local/bin"]:
@@ -68,8 +64,9 @@ def find_ytdlp() -> tuple[str, str]:
     )
 
 
+@functools.cache
 def find_ffmpeg() -> str:
-    """Find ffmpeg executable."""
+    """Find ffmpeg executable. Resolved once per process."""
     # Bundled
     bundled = os.environ.get("FFMPEG_BUNDLED_PATH")
     if bundled and _is_executable(Path(bundled)):
@@ -91,6 +88,7 @@ def find_ffmpeg() -> str:
     )
 
 
+@functools.cache
 def find_ffprobe() -> str | None:
     """Find ffprobe executable. Returns None if not found (non-critical)."""
     bundled = os.environ.get("FFPROBE_BUNDLED_PATH")
@@ -105,6 +103,7 @@ def find_ffprobe() -> str | None:
     return _find_in_path("ffprobe")
 
 
+@functools.cache
 def find_deno() -> str | None:
     """Find deno executable. Returns None if not found (non-critical)."""
     bundled = os.environ.get("DENO_BUNDLED_PATH")
@@ -128,7 +127,7 @@ def build_ytdlp_cmd(extra_args: list[str] | None = None) -> list[str]:
     ffmpeg_dir = str(Path(ffmpeg_path).parent)
 
     if mode == "module":
-        cmd = ["python3", "-m", "yt_dlp"]
+        cmd = [ytdlp_path, "-m", "yt_dlp"]
     else:
         cmd = [ytdlp_path]
 
@@ -141,7 +140,16 @@ def build_ytdlp_cmd(extra_args: list[str] | None = None) -> list[str]:
 
 
 def get_env() -> dict[str, str]:
-    """Get environment variables for subprocess calls."""
+    """
+    Get environment variables for subprocess calls.
+    Returns a fresh copy of a per-process cached environment, so callers may
+    modify it freely.
+    """
+    return dict(_build_env())
+
+
+@functools.cache
+def _build_env() -> dict[str, str]:
     env = os.environ.copy()
     env["PYTHONIOENCODING"] = "utf-8"
 
@@ -1,53 +1,131 @@
 """
 Download history CRUD module.
 
-Storage: ~/.config/media-pull/history.json
+Storage: ~/.config/media-pull/history.db (SQLite, FTS5 where available)
 
 Usage:
   python -m python.history load
   python -m python.history add <json_entry>
   python -m python.history search <query>
   python -m python.history clear
+  python -m python.history export [path]   (history.json format)
 """
 
 import json
+import sqlite3
 import sys
 from datetime import datetime
 from pathlib import Path
-
-from python.protocol import emit_result, emit_error
-
-
-HISTORY_FILE = Path.home() / ".config" / "media-pull" / "history.json"
-
-
-def _load() -> list:
-    """Load history from file."""
-    if HISTORY_FILE.exists():
+from typing import Iterator
+
+from python.protocol import emit_result, emit_error, json_loads, json_dumps
+
+
+# Entries live in an FTS5 table (plain table without FTS5); the full entry
+# is kept as a JSON payload
+HISTORY_DB = Path.home() / ".config" / "media-pull" / "history.db"
+# Older storage formats, imported once when the database is first created.
+# history.json is also the default target of the export command.
+JSON_HISTORY_FILE = HISTORY_DB.with_suffix(".json")
+JSONL_HISTORY_FILE = HISTORY_DB.with_suffix(".jsonl")
+MAX_ENTRIES = 500
+
+
+def _fts5_available() -> bool:
+    try:
+        sqlite3.connect(":memory:").execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+# SQLite builds without FTS5 get a plain table searched with LIKE
+_FTS5 = _fts5_available()
+_TABLE = "history_fts" if _FTS5 else "history"
+# The trigram tokenizer (SQLite 3.34+) keeps substring search semantics
+_TRIGRAM = _FTS5 and sqlite3.sqlite_version_info >= (3, 34, 0)
+
+
+def _connect() -> sqlite3.Connection:
+    """Open the history database, creating and migrating it if needed."""
+    is_new = not HISTORY_DB.exists()
+    HISTORY_DB.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(HISTORY_DB)
+    if _FTS5:
+        tokenize = ", tokenize='trigram'" if _TRIGRAM else ""
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts "
+            f"USING fts5(title, channel, url, payload UNINDEXED{tokenize})"
+        )
+    else:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS history (title TEXT, channel TEXT, url TEXT, payload TEXT)"
+        )
+    if is_new:
+        with conn:
+            _migrate_legacy(conn)
+    return conn
+
+
+def _read_legacy() -> list:
+    """Entries from history.jsonl / history.json, oldest first."""
+    entries = []
+    try:
+        for line in JSONL_HISTORY_FILE.read_bytes().splitlines():
+            if line:
+                try:
+                    entries.append(json_loads(line))
+                except ValueError:
+                    pass
+    except IOError:
+        pass
+    if not entries:
         try:
-            with open(HISTORY_FILE) as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
+            entries = json_loads(JSON_HISTORY_FILE.read_bytes())[::-1]
+        except (ValueError, IOError):
             pass
-    return []
+    return entries[-MAX_ENTRIES:]
+
 
+def _migrate_legacy(conn: sqlite3.Connection):
+    for entry in _read_legacy():
+        _insert(conn, entry)
+    JSONL_HISTORY_FILE.unlink(missing_ok=True)
 
-def _save(entries: list):
-    """Save history to file."""
-    HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(HISTORY_FILE, "w") as f:
-        json.dump(entries, f, indent=2, default=str)
+
+def _insert(conn: sqlite3.Connection, entry: dict):
+    conn.execute(
+        f"INSERT INTO {_TABLE} (title, channel, url, payload) VALUES (?, ?, ?, ?)",
+        (str(entry.get("title", "")), str(entry.get("channel", "")),
+         str(entry.get("url", "")), json_dumps(entry).decode()),
+    )
 
 
 def load_history() -> list:
-    """Load all history entries."""
-    return _load()
+    """Load all history entries, most recent first."""
+    conn = _connect()
+    try:
+        rows = conn.execute(f"SELECT payload FROM {_TABLE} ORDER BY rowid DESC")
+        return [json_loads(payload) for (payload,) in rows]
+    finally:
+        conn.close()
+
+
+def export_history(path: Path = JSON_HISTORY_FILE) -> dict:
+    """Write all entries, most recent first, as a JSON array (the old history.json format)."""
+    conn = _connect()
+    try:
+        rows = conn.execute(f"SELECT payload FROM {_TABLE} ORDER BY rowid DESC")
+        payloads = [payload for (payload,) in rows]
+    finally:
+        conn.close()
+    # Stored payloads are already JSON; join them instead of re-serializing
+    Path(path).write_text("[\n" + ",\n".join(payloads) + "\n]\n", encoding="utf-8")
+    return {"success": True, "path": str(path), "count": len(payloads)}
 
 
 def add_entry(entry: dict) -> dict:
     """Add a new history entry."""
-    entries = _load()
-
     # Ensure required fields
     entry.setdefault("timestamp", datetime.now().isoformat())
     entry.setdefault("title", "Unknown")
@@ -57,39 +135,66 @@ def add_entry(entry: dict) -> dict:
     entry.setdefault("output_path", "")
     entry.setdefault("file_size", 0)
 
-    entries.insert(0, entry)  # Most recent first
-
-    # Keep max 500 entries
-    entries = entries[:500]
-
-    _save(entries)
+    conn = _connect()
+    try:
+        with conn:
+            _insert(conn, entry)
+            # Keep max 500 entries
+            conn.execute(
+                f"DELETE FROM {_TABLE} WHERE rowid NOT IN "
+                f"(SELECT rowid FROM {_TABLE} ORDER BY rowid DESC LIMIT ?)",
+                (MAX_ENTRIES,),
+            )
+    finally:
+        conn.close()
     return entry
 
 
-def search_history(query: str) -> list:
-    """Search history by title, channel, or URL."""
-    entries = _load()
-    query_lower = query.lower()
-
-    results = []
-    for entry in entries:
-        if (query_lower in entry.get("title", "").lower()
-                or query_lower in entry.get("channel", "").lower()
-                or query_lower in entry.get("url", "").lower()):
-            results.append(entry)
-
-    return results
+def search_history(query: str, limit: int | None = None) -> Iterator[dict]:
+    """
+    Search history by title, channel, or URL, most recent first.
+    Yields entries lazily; stops after limit matches if given.
+    """
+    limit = -1 if limit is None else limit  # SQLite: negative LIMIT = no limit
+    conn = _connect()
+    try:
+        if _TRIGRAM and len(query) >= 3:
+            # Quoted phrase: trigram index does case-insensitive substring match
+            phrase = '"' + query.replace('"', '""') + '"'
+            rows = conn.execute(
+                "SELECT payload FROM history_fts WHERE history_fts MATCH ? "
+                "ORDER BY rowid DESC LIMIT ?",
+                (phrase, limit),
+            )
+        else:
+            # Too short for trigrams (or no trigram tokenizer): plain scan
+            pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            rows = conn.execute(
+                f"SELECT payload FROM {_TABLE} WHERE title LIKE ?1 ESCAPE '\\' "
+                "OR channel LIKE ?1 ESCAPE '\\' OR url LIKE ?1 ESCAPE '\\' "
+                "ORDER BY rowid DESC LIMIT ?2",
+                (pattern, limit),
+            )
+        for (payload,) in rows:
+            yield json_loads(payload)
+    finally:
+        conn.close()
 
 
 def clear_history() -> dict:
     """Clear all history."""
-    _save([])
+    conn = _connect()
+    try:
+        with conn:
+            conn.execute(f"DELETE FROM {_TABLE}")
+    finally:
+        conn.close()
     return {"success": True, "message": "History cleared"}
 
 
 def main():
     if len(sys.argv) < 2:
-        emit_error("usage", "Usage: python -m python.history <load|add|search|clear>")
+        emit_error("usage", "Usage: python -m python.history <load|add|search|clear|export>")
         return
 
     command = sys.argv[1]
@@ -114,13 +219,17 @@ def main():
         if len(sys.argv) < 3:
             emit_error("usage", "Usage: python -m python.history search <query>")
             return
-        results = search_history(sys.argv[2])
+        results = list(search_history(sys.argv[2]))
         emit_result({"entries": results, "count": len(results)})
 
     elif command == "clear":
         result = clear_history()
         emit_result(result)
 
+    elif command == "export":
+        path = Path(sys.argv[2]) if len(sys.argv) > 2 else JSON_HISTORY_FILE
+        emit_result(export_history(path))
+
     else:
         emit_error("usage", f"Unknown command: {command}")
 
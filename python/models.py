@@ -2,12 +2,12 @@
 Data models for Media Pull.
 """
 
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field, fields
 from enum import Enum
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class VideoFormat:
     format_id: str = ""
     ext: str = ""
@@ -22,10 +22,10 @@ class VideoFormat:
     format_note: str = ""
 
     def to_dict(self):
-        return asdict(self)
+        return {n: getattr(self, n) for n in self._FIELD_NAMES}
 
 
-@dataclass
+@dataclass(slots=True)
 class Chapter:
     title: str = ""
     start_time: float = 0.0
@@ -49,14 +49,14 @@ class Chapter:
         return sanitize_filename(self.title)
 
     def to_dict(self):
-        d = asdict(self)
+        d = {n: getattr(self, n) for n in self._FIELD_NAMES}
         d["duration"] = self.duration
         d["duration_str"] = self.duration_str
         d["start_time_str"] = self.start_time_str
         return d
 
 
-@dataclass
+@dataclass(slots=True)
 class PlaylistItem:
     id: str = ""
     title: str = ""
@@ -67,10 +67,10 @@ class PlaylistItem:
     is_available: bool = True
 
     def to_dict(self):
-        return asdict(self)
+        return {n: getattr(self, n) for n in self._FIELD_NAMES}
 
 
-@dataclass
+@dataclass(slots=True)
 class VideoInfo:
     id: str = ""
     title: str = ""
@@ -84,6 +84,26 @@ class VideoInfo:
     chapters: list = field(default_factory=list)
     playlist_items: list = field(default_factory=list)
     playlist_title: str = ""
+    # Display strings cached as (source value, formatted); reformatted only
+    # when duration/views change
+    _duration_cache: tuple = field(default=(None, ""), init=False, repr=False, compare=False)
+    _views_cache: tuple = field(default=(None, ""), init=False, repr=False, compare=False)
+
+    @property
+    def duration_str(self) -> str:
+        source, text = self._duration_cache
+        if source != self.duration:
+            text = format_duration(self.duration)
+            self._duration_cache = (self.duration, text)
+        return text
+
+    @property
+    def views_str(self) -> str:
+        source, text = self._views_cache
+        if source != self.views:
+            text = format_views(self.views)
+            self._views_cache = (self.views, text)
+        return text
 
     def to_dict(self):
         return {
@@ -91,9 +111,9 @@ class VideoInfo:
             "title": self.title,
             "channel": self.channel,
             "duration": self.duration,
-            "duration_str": format_duration(self.duration),
+            "duration_str": self.duration_str,
             "views": self.views,
-            "views_str": format_views(self.views),
+            "views_str": self.views_str,
             "url": self.url,
             "thumbnail_url": self.thumbnail_url,
             "upload_date": self.upload_date,
@@ -104,6 +124,12 @@ class VideoInfo:
         }
 
 
+# Field names resolved once, so to_dict never introspects fields() per call
+for _cls in (VideoFormat, Chapter, PlaylistItem):
+    _cls._FIELD_NAMES = tuple(f.name for f in fields(_cls))
+del _cls
+
+
 class DownloadStatus(Enum):
     QUEUED = "queued"
     DOWNLOADING = "downloading"
@@ -140,8 +166,6 @@ FORMAT_SELECTORS = {
     "resolution_first": "bv*[height>=2160]/bv*[height>=1440]/bv*",
     # Audio
     "audio": "bestaudio[acodec^=mp4a][ext=m4a]/bestaudio[ext=m4a]/bestaudio/best",
-    # Generic fallback
-    "generic": "bv*[height<={h}]/bv*",
 }
 
 
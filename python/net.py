@@ -0,0 +1,35 @@
+"""
+Shared HTTP GET for the API clients (SponsorBlock, GitHub releases).
+
+Uses a pooled urllib3 connection manager when urllib3 is available, so
+back-to-back calls reuse one TLS session; falls back to urllib otherwise.
+Redirects are followed either way.
+"""
+
+from urllib.request import urlopen, Request
+
+try:
+    import urllib3
+    # Fail fast on errors like urlopen does, but still follow redirects
+    _POOL = urllib3.PoolManager(
+        retries=urllib3.Retry(total=None, connect=0, read=0, status=0, other=0, redirect=5),
+    )
+except ImportError:
+    urllib3 = None
+    _POOL = None
+
+
+def http_get(url: str, headers: dict, timeout: float) -> bytes | None:
+    """GET a URL and return the body; None on HTTP (>= 400) or network errors."""
+    if _POOL is not None:
+        try:
+            response = _POOL.request("GET", url, headers=headers, timeout=timeout)
+        except urllib3.exceptions.HTTPError:
+            return None
+        return response.data if response.status < 400 else None
+
+    try:
+        with urlopen(Request(url, headers=headers), timeout=timeout) as response:
+            return response.read()
+    except OSError:  # URLError, HTTPError and socket timeouts
+        return None
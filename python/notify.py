@@ -23,18 +23,19 @@ def _sanitize(text: str) -> str:
 
 
 def send_notification(title: str, message: str):
-    """Send a macOS notification."""
+    """Send a macOS notification without waiting for osascript to finish."""
     safe_title = _sanitize(title)
     safe_message = _sanitize(message)
 
     script = f'display notification "{safe_message}" with title "{safe_title}"'
 
     try:
-        subprocess.run(
+        subprocess.Popen(
             ["osascript", "-e", script],
-            capture_output=True, timeout=5,
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL, start_new_session=True,
         )
-    except Exception:
+    except OSError:
         pass  # Notifications are non-critical
 
 
@@ -7,13 +7,35 @@ Rust reads line-by-line, parses the 'event' field, and routes accordingly.
 
 import json
 import sys
+import time
+
+# JSON codec shared by every module: orjson when installed, stdlib otherwise
+try:
+    import orjson
+    json_loads = orjson.loads
+
+    def json_dumps(obj, indent: bool = False) -> bytes:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2 if indent else 0)
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj, indent: bool = False) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, default=str,
+                          indent=2 if indent else None).encode("utf-8")
+
+# emit_progress_throttled: last (percent, monotonic time) emitted per stage
+_last_progress: dict[str, tuple[float, float]] = {}
 
 
 def _emit(obj: dict):
-    """Write a JSON object as a single line to stdout and flush."""
-    line = json.dumps(obj, ensure_ascii=False, default=str)
-    sys.stdout.write(line + "\n")
-    sys.stdout.flush()
+    """
+    Write a JSON object as a single line to stdout and flush.
+    One write per event keeps lines intact when several threads emit.
+    """
+    data = json_dumps(obj) + b"\n"
+    out = sys.stdout.buffer
+    out.write(data)
+    out.flush()
 
 
 def emit_progress(stage: str, percent: float, speed_mbps: float = 0.0,
@@ -29,6 +51,20 @@ def emit_progress(stage: str, percent: float, speed_mbps: float = 0.0,
     })
 
 
+def emit_progress_throttled(stage: str, percent: float, min_step: float = 1.0,
+                            interval: float = 0.1, **kwargs):
+    """
+    emit_progress, but dropped if the stage moved less than min_step percent
+    and less than interval seconds have passed since its last event.
+    """
+    now = time.monotonic()
+    last = _last_progress.get(stage)
+    if last and abs(percent - last[0]) < min_step and now - last[1] < interval:
+        return
+    _last_progress[stage] = (percent, now)
+    emit_progress(stage, percent, **kwargs)
+
+
 def emit_result(data):
     """Emit the final result. Must be the last event on success."""
     _emit({
@@ -16,7 +16,7 @@ import os
 import sys
 from pathlib import Path
 
-from python.protocol import emit_result, emit_error
+from python.protocol import emit_result, emit_error, json_loads, json_dumps
 
 
 CONFIG_DIR = Path.home() / ".config" / "media-pull"
@@ -29,46 +29,52 @@ DEFAULT_CONFIG = {
     "window_height": 700,
 }
 
-DEFAULT_SETTINGS = {
-    "cookies": {
-        "enabled": False,
-        "browser": "",
-        "profile": "",
-    },
-    "sponsorblock": {
-        "enabled": True,
-        "categories": [
-            "sponsor", "intro", "outro", "selfpromo",
-            "preview", "music_offtopic", "interaction", "filler",
-        ],
-    },
-    "subtitles": {
-        "enabled": False,
-        "languages": ["en"],
-        "auto_generated": True,
-    },
-    "encoding": {
-        "encoder": "auto",
-        "preset": "medium",
-        "bitrate_mode": "auto",
-        "audio_bitrate": "192k",
-        "custom_bitrate": 15,
-        "per_resolution": {
-            "2160": 45,
-            "1440": 30,
-            "1080": 15,
-            "720": 10,
-            "480": 5,
+
+def _default_settings() -> dict:
+    """A fresh copy of the default settings (built from literals, no deep copy)."""
+    return {
+        "cookies": {
+            "enabled": False,
+            "browser": "",
+            "profile": "",
         },
-    },
-    "playlist": {
-        "default_selection": "all",
-        "max_videos": 0,
-    },
-    "advanced": {
-        "debug": False,
-    },
-}
+        "sponsorblock": {
+            "enabled": True,
+            "categories": [
+                "sponsor", "intro", "outro", "selfpromo",
+                "preview", "music_offtopic", "interaction", "filler",
+            ],
+        },
+        "subtitles": {
+            "enabled": False,
+            "languages": ["en"],
+            "auto_generated": True,
+        },
+        "encoding": {
+            "encoder": "auto",
+            "preset": "medium",
+            "bitrate_mode": "auto",
+            "audio_bitrate": "192k",
+            "custom_bitrate": 15,
+            "per_resolution": {
+                "2160": 45,
+                "1440": 30,
+                "1080": 15,
+                "720": 10,
+                "480": 5,
+            },
+        },
+        "playlist": {
+            "default_selection": "all",
+            "max_videos": 0,
+        },
+        "advanced": {
+            "debug": False,
+        },
+    }
+
+
+DEFAULT_SETTINGS = _default_settings()
 
 
 def _ensure_dir():
@@ -80,12 +86,11 @@ def load_config() -> dict:
     _ensure_dir()
     if CONFIG_FILE.exists():
         try:
-            with open(CONFIG_FILE) as f:
-                data = json.load(f)
+            data = json_loads(CONFIG_FILE.read_bytes())
             # Merge with defaults
             result = {**DEFAULT_CONFIG, **data}
             return result
-        except (json.JSONDecodeError, IOError):
+        except (ValueError, IOError):
             pass
     return dict(DEFAULT_CONFIG)
 
@@ -93,8 +98,7 @@ def load_config() -> dict:
 def save_config(config: dict):
     """Save app config."""
     _ensure_dir()
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=2)
+    CONFIG_FILE.write_bytes(json_dumps(config, indent=True))
 
 
 def load_settings() -> dict:
@@ -102,29 +106,28 @@ def load_settings() -> dict:
     _ensure_dir()
     if SETTINGS_FILE.exists():
         try:
-            with open(SETTINGS_FILE) as f:
-                data = json.load(f)
+            data = json_loads(SETTINGS_FILE.read_bytes())
             # Deep merge with defaults
-            result = _deep_merge(DEFAULT_SETTINGS, data)
+            result = _deep_merge(_default_settings(), data)
             return result
-        except (json.JSONDecodeError, IOError):
+        except (ValueError, IOError):
             pass
-    return json.loads(json.dumps(DEFAULT_SETTINGS))
+    return _default_settings()
 
 
 def save_settings(settings: dict):
     """Save feature settings."""
     _ensure_dir()
-    with open(SETTINGS_FILE, "w") as f:
-        json.dump(settings, f, indent=2)
+    SETTINGS_FILE.write_bytes(json_dumps(settings, indent=True))
 
 
 def _deep_merge(default: dict, override: dict) -> dict:
-    """Deep merge override into default."""
-    result = dict(default)
+    """Deep merge override into default. Inputs are plain JSON dicts."""
+    result = {**default}
     for key, value in override.items():
-        if key in result and isinstance(result[key], dict) and isinstance(value, dict):
-            result[key] = _deep_merge(result[key], value)
+        dv = result.get(key)
+        if type(dv) is dict and type(value) is dict:
+            result[key] = _deep_merge(dv, value)
         else:
             result[key] = value
     return result
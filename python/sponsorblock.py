@@ -7,16 +7,18 @@ Usage:
   python -m python.sponsorblock remove --video FILE --video-id ID --output FILE
 """
 
+import bisect
 import hashlib
 import json
+import os
 import re
 import subprocess
 import sys
-from urllib.request import urlopen, Request
-from urllib.error import URLError
 
-from python.protocol import emit_result, emit_error, emit_log, emit_progress
-from python.exec_resolve import find_ffmpeg, get_env
+from python.protocol import emit_result, emit_error, emit_log, emit_progress, emit_progress_throttled
+from python.exec_resolve import find_ffmpeg, find_ffprobe, get_env
+from python.net import http_get
+
 
 
 API_BASE = "https://sponsor.ajay.app/api/skipSegments"
@@ -26,6 +28,48 @@ CATEGORIES = [
     "preview", "music_offtopic", "interaction", "filler",
 ]
 
+# ffmpeg banner / status-line patterns
+_DUR_RE = re.compile(r"Duration:\s+(\d{2}):(\d{2}):(\d{2})\.(\d{2})")
+_TIME_RE = re.compile(rb"time=(\d{2}):(\d{2}):(\d{2})\.(\d{2})")
+_LINE_SPLIT_RE = re.compile(rb"[\r\n]")
+STDERR_CHUNK = 4096
+
+# Sponsor segments closer together than this are cut as one (seconds)
+MERGE_GAP = 1.0
+# Sponsor segments shorter than this are not worth a cut (seconds)
+MIN_SEGMENT = 0.5
+# Beyond this many keep intervals the select expression gets unwieldy for
+# ffmpeg to parse; cut with the concat demuxer instead
+MAX_FILTER_INTERVALS = 100
+# Stream-copy when every cut can be moved onto a keyframe by at most this
+# much (seconds); otherwise re-encode for frame-accurate cuts
+MAX_KEYFRAME_DRIFT = 1.0
+
+
+def _api_get(url: str):
+    """GET and decode a SponsorBlock JSON response; None on HTTP/network errors."""
+    # 404 means no segments for this hash prefix
+    data = http_get(url, {"User-Agent": "YouTube4KDownloader/1.0"}, timeout=10)
+    return json.loads(data) if data is not None else None
+
+
+def _iter_stderr_lines(stream):
+    """
+    Yield raw lines from a binary ffmpeg stderr pipe.
+    ffmpeg ends status lines with \\r, so split on both \\r and \\n.
+    """
+    buf = bytearray()
+    while True:
+        chunk = stream.read1(STDERR_CHUNK)
+        if not chunk:
+            break
+        buf += chunk
+        *lines, rest = _LINE_SPLIT_RE.split(buf)
+        yield from lines
+        buf = bytearray(rest)
+    if buf:
+        yield bytes(buf)
+
 
 def fetch_segments(video_id: str, categories: list[str] | None = None) -> list[dict]:
     """
@@ -35,23 +79,21 @@ def fetch_segments(video_id: str, categories: list[str] | None = None) -> list[d
     if not categories:
         categories = CATEGORIES
 
-    # SHA256 hash prefix (first 4 chars) for privacy
-    hash_full = hashlib.sha256(video_id.encode()).hexdigest()
-    hash_prefix = hash_full[:4]
+    # SHA256 hash prefix (first 4 chars) for privacy. The API defines the
+    # hash, so it has to stay SHA-256; it isn't a security use.
+    hash_prefix = hashlib.new("sha256", video_id.encode(), usedforsecurity=False).hexdigest()[:4]
 
     # Build category params
     cat_params = "&".join(f"category={c}" for c in categories)
     url = f"{API_BASE}/{hash_prefix}?{cat_params}"
 
     try:
-        req = Request(url, headers={"User-Agent": "YouTube4KDownloader/1.0"})
-        response = urlopen(req, timeout=10)
-        data = json.loads(response.read().decode())
-    except URLError:
-        emit_log("debug", "SponsorBlock API unavailable")
-        return []
+        data = _api_get(url)
     except json.JSONDecodeError:
         return []
+    if data is None:
+        emit_log("debug", "SponsorBlock API unavailable")
+        return []
 
     # Find matching video in response
     segments = []
@@ -68,42 +110,128 @@ def fetch_segments(video_id: str, categories: list[str] | None = None) -> list[d
     return segments
 
 
-def build_ffmpeg_filter(segments: list[dict], duration: float) -> str:
+def _keep_intervals(segments: list[dict], duration: float) -> list[tuple[float, float]]:
     """
-    Build an ffmpeg select/aselect filter to KEEP non-sponsor parts.
+    (start, end) intervals to KEEP once sponsor segments are cut out.
+    Segments separated by tiny gaps are fused and very short ones dropped.
     """
-    if not segments:
-        return ""
-
-    # Sort segments by start time
-    segments.sort(key=lambda s: s["start"])
-
-    # Merge overlapping segments
     merged = []
-    for seg in segments:
-        if merged and seg["start"] <= merged[-1]["end"]:
-            merged[-1]["end"] = max(merged[-1]["end"], seg["end"])
+    for seg in sorted(segments, key=lambda s: s["start"]):
+        if seg["end"] - seg["start"] < MIN_SEGMENT:
+            continue
+        if merged and seg["start"] - merged[-1][1] < MERGE_GAP:
+            merged[-1][1] = max(merged[-1][1], seg["end"])
         else:
-            merged.append(dict(seg))
+            merged.append([seg["start"], seg["end"]])
 
-    # Build "keep" intervals
-    keep_parts = []
+    keep = []
     last_end = 0.0
-    for seg in merged:
-        if seg["start"] > last_end:
-            keep_parts.append(f"between(t,{last_end},{seg['start']})")
-        last_end = seg["end"]
+    for start, end in merged:
+        if start > last_end:
+            keep.append((last_end, start))
+        last_end = end
 
     if last_end < duration:
-        keep_parts.append(f"between(t,{last_end},{duration})")
+        keep.append((last_end, duration))
 
-    if not keep_parts:
-        return ""
+    return keep
 
-    select_expr = "+".join(keep_parts)
+
+def _select_filters(keep: list[tuple[float, float]]) -> tuple[str, str]:
+    select_expr = "+".join(f"between(t,{start},{end})" for start, end in keep)
     return f"select='{select_expr}',setpts=N/FRAME_RATE/TB", f"aselect='{select_expr}',asetpts=N/SR/TB"
 
 
+def build_ffmpeg_filter(segments: list[dict], duration: float) -> tuple[str, str] | str:
+    """
+    Build an ffmpeg select/aselect filter to KEEP non-sponsor parts.
+    """
+    if not segments:
+        return ""
+
+    keep = _keep_intervals(segments, duration)
+    if not keep:
+        return ""
+
+    return _select_filters(keep)
+
+
+def _probe_duration(ffmpeg: str, video_path: str) -> float:
+    """Container duration in seconds; 0 if it can't be determined."""
+    ffprobe = find_ffprobe()
+    if ffprobe:
+        try:
+            proc = subprocess.run(
+                [ffprobe, "-v", "error", "-show_entries", "format=duration",
+                 "-of", "default=nw=1:nk=1", video_path],
+                capture_output=True, text=True, timeout=5, env=get_env(),
+            )
+            return float(proc.stdout.strip())
+        except (OSError, subprocess.TimeoutExpired, ValueError):
+            pass
+
+    # No usable ffprobe: read the Duration: banner from ffmpeg
+    try:
+        proc = subprocess.run(
+            [ffmpeg, "-i", video_path],
+            capture_output=True, text=True, timeout=15
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return 0
+    m = _DUR_RE.search(proc.stderr)
+    if not m:
+        return 0
+    return int(m.group(1)) * 3600 + int(m.group(2)) * 60 + int(m.group(3)) + int(m.group(4)) / 100.0
+
+
+def _keyframe_times(video_path: str) -> list[float]:
+    """Sorted video keyframe timestamps via ffprobe; empty if unavailable."""
+    ffprobe = find_ffprobe()
+    if not ffprobe:
+        return []
+    try:
+        proc = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", video_path],
+            capture_output=True, timeout=60, env=get_env(),
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return []
+    times = []
+    for line in proc.stdout.splitlines():
+        pts, _, flags = line.partition(b",")
+        if b"K" in flags:
+            try:
+                times.append(float(pts))
+            except ValueError:
+                pass
+    times.sort()
+    return times
+
+
+def _snap_to_keyframes(keep: list[tuple[float, float]], keyframes: list[float]):
+    """
+    Move each keep interval's start onto the nearest keyframe, as a stream
+    copy can only begin there. None if any start would drift too far.
+    """
+    snapped = []
+    for start, end in keep:
+        i = bisect.bisect_left(keyframes, start)
+        nearest = min(keyframes[max(i - 1, 0):i + 1], key=lambda k: abs(k - start))
+        if abs(nearest - start) > MAX_KEYFRAME_DRIFT or nearest >= end:
+            return None
+        snapped.append((nearest, end))
+    return snapped
+
+
+def _write_concat_list(list_path: str, video_path: str, keep: list[tuple[float, float]]):
+    """Write a concat demuxer script that plays only the keep intervals."""
+    quoted = "'" + video_path.replace("'", "'\\''") + "'"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for start, end in keep:
+            f.write(f"file {quoted}\ninpoint {start}\noutpoint {end}\n")
+
+
 def remove_sponsors(
     video_path: str,
     video_id: str,
@@ -126,69 +254,78 @@ def remove_sponsors(
     total_removed = sum(s["end"] - s["start"] for s in segments)
     emit_log("info", f"Found {len(segments)} sponsor segments ({total_removed:.0f}s total)")
 
-    # Get video duration
     ffmpeg = find_ffmpeg()
-    try:
-        proc = subprocess.run(
-            [ffmpeg, "-i", video_path],
-            capture_output=True, text=True, timeout=15
-        )
-        m = re.search(r"Duration:\s+(\d{2}):(\d{2}):(\d{2})\.(\d{2})", proc.stderr)
-        if m:
-            duration = int(m.group(1)) * 3600 + int(m.group(2)) * 60 + int(m.group(3)) + int(m.group(4)) / 100.0
-        else:
-            duration = 0
-    except Exception:
-        duration = 0
+    duration = _probe_duration(ffmpeg, video_path)
 
     if duration <= 0:
         emit_log("warning", "Could not determine duration, skipping SponsorBlock")
         return video_path
 
-    filter_result = build_ffmpeg_filter(segments, duration)
-    if not filter_result:
+    keep = _keep_intervals(segments, duration)
+    if not keep:
+        emit_log("warning", "Sponsor segments cover the whole video, keeping original")
+        emit_progress("sponsorblock", stage_offset + stage_weight)
         return video_path
+    if keep == [(0.0, duration)]:
+        emit_log("info", "Sponsor segments too short to cut")
+        emit_progress("sponsorblock", stage_offset + stage_weight)
+        return video_path
+    kept_duration = sum(end - start for start, end in keep)
 
-    video_filter, audio_filter = filter_result
-
-    # Re-encode with segments removed
+    # Cut the sponsor segments out
     output_path = video_path.replace(".mp4", "_nosponsor.mp4")
-    cmd = [
-        ffmpeg, "-y",
-        "-i", video_path,
-        "-vf", video_filter,
-        "-af", audio_filter,
-        "-c:v", "h264_videotoolbox",
-        "-c:a", "aac",
-        "-b:a", "192k",
-        "-movflags", "+faststart",
-        output_path,
-    ]
-
+    list_path = None
     try:
+        keyframes = _keyframe_times(video_path)
+        snapped = _snap_to_keyframes(keep, keyframes) if keyframes else None
+        if snapped:
+            # Cuts land on keyframes: no decode/encode needed
+            list_path = output_path + ".concat.txt"
+            _write_concat_list(list_path, video_path, snapped)
+            cmd = [
+                ffmpeg, "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+                "-c", "copy", "-movflags", "+faststart", output_path,
+            ]
+        else:
+            if len(keep) > MAX_FILTER_INTERVALS:
+                list_path = output_path + ".concat.txt"
+                _write_concat_list(list_path, video_path, keep)
+                cmd = [ffmpeg, "-y", "-f", "concat", "-safe", "0", "-i", list_path]
+            else:
+                video_filter, audio_filter = _select_filters(keep)
+                cmd = [ffmpeg, "-y", "-i", video_path, "-vf", video_filter, "-af", audio_filter]
+            cmd += [
+                "-c:v", "h264_videotoolbox",
+                "-c:a", "aac",
+                "-b:a", "192k",
+                "-movflags", "+faststart",
+                output_path,
+            ]
+
         proc = subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-            text=True, env=get_env()
+            cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+            env=get_env()
         )
 
-        for line in proc.stderr:
-            line = line.strip()
-            time_match = re.search(r"time=(\d{2}):(\d{2}):(\d{2})\.(\d{2})", line)
+        last_current = -1
+        for line in _iter_stderr_lines(proc.stderr):
+            time_match = _TIME_RE.search(line)
             if time_match:
                 h = int(time_match.group(1))
                 m = int(time_match.group(2))
                 s = int(time_match.group(3))
                 current = h * 3600 + m * 60 + s
-                if duration > 0:
-                    pct = min(current / duration, 1.0)
+                # Only report when the encode position has actually moved
+                if current != last_current:
+                    last_current = current
+                    pct = min(current / kept_duration, 1.0)
                     overall = stage_offset + pct * stage_weight
-                    emit_progress("sponsorblock", overall)
+                    emit_progress_throttled("sponsorblock", overall)
 
         proc.wait(timeout=3600)
 
         if proc.returncode == 0:
             # Replace original with processed version
-            import os
             os.replace(output_path, video_path)
             emit_log("info", "Sponsor segments removed successfully")
             return video_path
@@ -205,6 +342,13 @@ def remove_sponsors(
         emit_log("warning", f"SponsorBlock error: {e}")
         return video_path
 
+    finally:
+        if list_path:
+            try:
+                os.unlink(list_path)
+            except OSError:
+                pass
+
 
 def main():
     if len(sys.argv) < 2:
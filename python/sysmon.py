@@ -5,11 +5,161 @@ Usage:
   python -m python.sysmon snapshot
 """
 
+import ctypes
+import functools
+import json
+import os
+import re
 import subprocess
 import sys
+import time
+from pathlib import Path
 
 from python.protocol import emit_result, emit_error
 
+# Each snapshot runs in a fresh process, so the previous CPU-times sample is
+# kept on disk and the next snapshot measures the delta without blocking.
+CPU_SAMPLE_FILE = Path.home() / ".cache" / "media-pull" / "cpu_sample.json"
+CPU_SAMPLE_MAX_AGE = 30.0  # seconds; older samples would average over too long
+
+
+def _cpu_percent_since_last(total: float, idle: float) -> float:
+    """
+    CPU usage since the previous snapshot, from cumulative total/idle times.
+    0.0 when there's no recent sample.
+    """
+    now = time.time()
+
+    percent = 0.0
+    try:
+        with open(CPU_SAMPLE_FILE) as f:
+            last = json.load(f)
+        if 0 < now - last["time"] <= CPU_SAMPLE_MAX_AGE:
+            d_total = total - last["total"]
+            d_idle = idle - last["idle"]
+            if d_total > 0:
+                percent = round(min(max((d_total - d_idle) / d_total * 100, 0.0), 100.0), 1)
+    except (OSError, json.JSONDecodeError, KeyError, TypeError):
+        pass
+
+    try:
+        CPU_SAMPLE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with open(CPU_SAMPLE_FILE, "w") as f:
+            json.dump({"time": now, "total": total, "idle": idle}, f)
+    except OSError:
+        pass  # Next snapshot just reports 0.0 again
+    return percent
+
+
+# Direct kernel queries via libSystem (macOS), used when psutil is missing
+try:
+    _libc = ctypes.CDLL("/usr/lib/libSystem.B.dylib")
+except OSError:
+    _libc = None
+
+_HOST_CPU_LOAD_INFO = 3  # natural_t cpu_ticks[CPU_STATE_MAX]: user, system, idle, nice
+_HOST_VM_INFO64 = 4
+_CPU_STATE_IDLE = 2
+
+
+class _VMStatistics64(ctypes.Structure):
+    """struct vm_statistics64 from <mach/vm_statistics.h>."""
+    _fields_ = [
+        ("free_count", ctypes.c_uint32),
+        ("active_count", ctypes.c_uint32),
+        ("inactive_count", ctypes.c_uint32),
+        ("wire_count", ctypes.c_uint32),
+        ("zero_fill_count", ctypes.c_uint64),
+        ("reactivations", ctypes.c_uint64),
+        ("pageins", ctypes.c_uint64),
+        ("pageouts", ctypes.c_uint64),
+        ("faults", ctypes.c_uint64),
+        ("cow_faults", ctypes.c_uint64),
+        ("lookups", ctypes.c_uint64),
+        ("hits", ctypes.c_uint64),
+        ("purges", ctypes.c_uint64),
+        ("purgeable_count", ctypes.c_uint32),
+        ("speculative_count", ctypes.c_uint32),
+        ("decompressions", ctypes.c_uint64),
+        ("compressions", ctypes.c_uint64),
+        ("swapins", ctypes.c_uint64),
+        ("swapouts", ctypes.c_uint64),
+        ("compressor_page_count", ctypes.c_uint32),
+        ("throttled_count", ctypes.c_uint32),
+        ("external_page_count", ctypes.c_uint32),
+        ("internal_page_count", ctypes.c_uint32),
+        ("total_uncompressed_pages_in_compressor", ctypes.c_uint64),
+    ]
+
+
+def _host_statistics(fn, flavor: int, buf) -> bool:
+    count = ctypes.c_uint32(ctypes.sizeof(buf) // ctypes.sizeof(ctypes.c_int32))
+    return fn(_libc.mach_host_self(), flavor, ctypes.byref(buf), ctypes.byref(count)) == 0
+
+
+def _sysctl_uint64(name: bytes) -> int | None:
+    """sysctlbyname() for a 64-bit integer value such as hw.memsize."""
+    if _libc is None:
+        return None
+    value = ctypes.c_uint64(0)
+    size = ctypes.c_size_t(ctypes.sizeof(value))
+    if _libc.sysctlbyname(name, ctypes.byref(value), ctypes.byref(size), None, ctypes.c_size_t(0)) != 0:
+        return None
+    return value.value
+
+
+@functools.cache
+def _total_memory() -> int | None:
+    """Physical memory in bytes; fixed for the life of the process."""
+    return _sysctl_uint64(b"hw.memsize")
+
+
+@functools.cache
+def _page_size() -> int:
+    return os.sysconf("SC_PAGE_SIZE")
+
+
+def _mach_cpu_ticks() -> tuple[float, float] | None:
+    """Cumulative (total, idle) CPU ticks across all cores."""
+    if _libc is None:
+        return None
+    ticks = (ctypes.c_uint32 * 4)()
+    if not _host_statistics(_libc.host_statistics, _HOST_CPU_LOAD_INFO, ticks):
+        return None
+    return float(sum(ticks)), float(ticks[_CPU_STATE_IDLE])
+
+
+def _mach_vm_pages() -> dict | None:
+    """Active / wired / compressed page counts, as vm_stat reports them."""
+    if _libc is None:
+        return None
+    vm = _VMStatistics64()
+    if not _host_statistics(_libc.host_statistics64, _HOST_VM_INFO64, vm):
+        return None
+    return {
+        "active": vm.active_count,
+        "wired": vm.wire_count,
+        "compressed": vm.compressor_page_count,
+    }
+
+
+def _vm_stat_pages() -> dict:
+    """Same as _mach_vm_pages, parsed from the vm_stat command."""
+    proc = subprocess.run(
+        ["vm_stat"],
+        capture_output=True, text=True, timeout=5,
+    )
+    pages = {}
+    for line in proc.stdout.split("\n"):
+        m = re.match(r"(.+?):\s+(\d+)", line)
+        if m:
+            pages[m.group(1).strip()] = int(m.group(2))
+    return {
+        "active": pages.get("Pages active", 0),
+        "wired": pages.get("Pages wired down", 0),
+        "compressed": pages.get("Pages occupied by compressor", 0),
+    }
+
 
 def get_snapshot() -> dict:
     """Get current system resource usage snapshot."""
@@ -24,54 +174,39 @@ def get_snapshot() -> dict:
     # Try psutil first
     try:
         import psutil
-        result["cpu_percent"] = psutil.cpu_percent(interval=0.5)
+        times = psutil.cpu_times()
+        result["cpu_percent"] = _cpu_percent_since_last(
+            sum(times), times.idle + getattr(times, "iowait", 0.0)
+        )
         mem = psutil.virtual_memory()
         result["memory_percent"] = mem.percent
         result["memory_used_gb"] = round(mem.used / (1024**3), 1)
         result["memory_total_gb"] = round(mem.total / (1024**3), 1)
     except ImportError:
-        # Fallback: use macOS commands
-        try:
-            # CPU via top
-            proc = subprocess.run(
-                ["top", "-l", "1", "-n", "0", "-stats", "cpu"],
-                capture_output=True, text=True, timeout=5,
-            )
-            for line in proc.stdout.split("\n"):
-                if "CPU usage" in line:
-                    import re
-                    m = re.search(r"(\d+\.?\d*)% user.*?(\d+\.?\d*)% sys", line)
-                    if m:
-                        result["cpu_percent"] = float(m.group(1)) + float(m.group(2))
-                    break
-        except Exception:
-            pass
+        # Fallback: ask the kernel directly; shell out only if that fails
+        cpu = _mach_cpu_ticks()
+        if cpu:
+            result["cpu_percent"] = _cpu_percent_since_last(*cpu)
+        else:
+            try:
+                # CPU via top
+                proc = subprocess.run(
+                    ["top", "-l", "1", "-n", "0", "-stats", "cpu"],
+                    capture_output=True, text=True, timeout=5,
+                )
+                for line in proc.stdout.split("\n"):
+                    if "CPU usage" in line:
+                        m = re.search(r"(\d+\.?\d*)% user.*?(\d+\.?\d*)% sys", line)
+                        if m:
+                            result["cpu_percent"] = float(m.group(1)) + float(m.group(2))
+                        break
+            except Exception:
+                pass
 
         try:
-            # Memory via vm_stat
-            proc = subprocess.run(
-                ["vm_stat"],
-                capture_output=True, text=True, timeout=5,
-            )
-            import re
-            pages = {}
-            for line in proc.stdout.split("\n"):
-                m = re.match(r"(.+?):\s+(\d+)", line)
-                if m:
-                    pages[m.group(1).strip()] = int(m.group(2))
-
-            page_size = 16384  # Default macOS page size
-            active = pages.get("Pages active", 0) * page_size
-            wired = pages.get("Pages wired down", 0) * page_size
-            compressed = pages.get("Pages occupied by compressor", 0) * page_size
-            used = active + wired + compressed
-
-            # Get total memory
-            proc2 = subprocess.run(
-                ["sysctl", "-n", "hw.memsize"],
-                capture_output=True, text=True, timeout=5,
-            )
-            total = int(proc2.stdout.strip())
+            pages = _mach_vm_pages() or _vm_stat_pages()
+            used = (pages["active"] + pages["wired"] + pages["compressed"]) * _page_size()
+            total = _total_memory()
 
             result["memory_used_gb"] = round(used / (1024**3), 1)
             result["memory_total_gb"] = round(total / (1024**3), 1)
@@ -85,7 +220,6 @@ def get_snapshot() -> dict:
             ["ioreg", "-r", "-d", "1", "-c", "AppleGPU"],
             capture_output=True, text=True, timeout=5,
         )
-        import re
         m = re.search(r'"GPU Core Utilization\(%\)"\s*=\s*(\d+)', proc.stdout)
         if m:
             result["gpu_percent"] = float(m.group(1))
@@ -9,15 +9,19 @@ Usage:
   python -m python.updater install <version> <true|false>
 """
 
+import hashlib
 import json
 import os
+import shutil
 import stat
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from urllib.request import urlopen, Request
-from urllib.error import URLError
 
-from python.protocol import emit_result, emit_error, emit_log, emit_progress
+from python.net import http_get
+from python.protocol import emit_result, emit_error, emit_log, emit_progress, emit_progress_throttled
+
 
 
 APP_SUPPORT_DIR = Path.home() / "Library" / "Application Support" / "Media Pull"
@@ -25,23 +29,33 @@ VERSION_FILE = APP_SUPPORT_DIR / "yt-dlp-version.txt"
 
 STABLE_API = "https://api.github.com/repos/yt-dlp/yt-dlp/releases/latest"
 NIGHTLY_API = "https://api.github.com/repos/yt-dlp/yt-dlp-nightly-builds/releases/latest"
+DOWNLOAD_CHUNK = 1024 * 1024  # copyfileobj buffer size
 
 
 def _github_get(url: str) -> dict | None:
     """Fetch JSON from GitHub API."""
+    headers = {
+        "User-Agent": "YouTube4KDownloader/1.0",
+        "Accept": "application/vnd.github.v3+json",
+    }
+    data = http_get(url, headers, timeout=15)
+    if data is None:
+        return None
     try:
-        req = Request(url, headers={
-            "User-Agent": "YouTube4KDownloader/1.0",
-            "Accept": "application/vnd.github.v3+json",
-        })
-        response = urlopen(req, timeout=15)
-        return json.loads(response.read().decode())
-    except (URLError, json.JSONDecodeError):
+        return json.loads(data)
+    except json.JSONDecodeError:
         return None
 
 
 def check_updates() -> dict:
     """Check for yt-dlp updates. Returns current + available versions."""
+    # Both release lookups are independent; start them now so they overlap
+    # each other and the local version probe below
+    pool = ThreadPoolExecutor(max_workers=2)
+    stable_future = pool.submit(_github_get, STABLE_API)
+    nightly_future = pool.submit(_github_get, NIGHTLY_API)
+    pool.shutdown(wait=False)
+
     current_version = ""
     if VERSION_FILE.exists():
         current_version = VERSION_FILE.read_text().strip()
@@ -53,7 +67,7 @@ def check_updates() -> dict:
             from python.exec_resolve import find_ytdlp, get_env
             ytdlp_path, mode = find_ytdlp()
             if mode == "module":
-                cmd = ["python3", "-m", "yt_dlp", "--version"]
+                cmd = [ytdlp_path, "-m", "yt_dlp", "--version"]
             else:
                 cmd = [ytdlp_path, "--version"]
             proc = subprocess.run(
@@ -68,7 +82,7 @@ def check_updates() -> dict:
     result = {"current_version": current_version}
 
     # Check stable
-    stable_data = _github_get(STABLE_API)
+    stable_data = stable_future.result()
     if stable_data:
         result["stable_version"] = stable_data.get("tag_name", "")
         result["stable_url"] = ""
@@ -78,7 +92,7 @@ def check_updates() -> dict:
                 break
 
     # Check nightly
-    nightly_data = _github_get(NIGHTLY_API)
+    nightly_data = nightly_future.result()
     if nightly_data:
         result["nightly_version"] = nightly_data.get("tag_name", "")
         result["nightly_url"] = ""
@@ -96,6 +110,27 @@ def check_updates() -> dict:
     return result
 
 
+class _ProgressFile:
+    """
+    Write-through file wrapper that reports download progress (30-90%)
+    and hashes the bytes as they pass.
+    """
+
+    def __init__(self, f, total: int):
+        self._f = f
+        self._total = total
+        self._written = 0
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data) -> int:
+        self.sha256.update(data)
+        n = self._f.write(data)
+        self._written += n
+        if self._total > 0:
+            emit_progress_throttled("update", 30 + (self._written / self._total) * 60)
+        return n
+
+
 def install_update(version: str, nightly: bool = False) -> dict:
     """Download and install a specific yt-dlp version."""
     emit_log("info", f"Downloading yt-dlp {version}...")
@@ -109,9 +144,12 @@ def install_update(version: str, nightly: bool = False) -> dict:
         return {"success": False}
 
     download_url = ""
+    expected_digest = ""
     for asset in data.get("assets", []):
         if asset["name"] == "yt-dlp_macos":
             download_url = asset["browser_download_url"]
+            # Newer releases publish "sha256:<hex>"
+            expected_digest = asset.get("digest") or ""
             break
 
     if not download_url:
@@ -121,6 +159,7 @@ def install_update(version: str, nightly: bool = False) -> dict:
     # Download
     APP_SUPPORT_DIR.mkdir(parents=True, exist_ok=True)
     output_path = APP_SUPPORT_DIR / "yt-dlp"
+    part_path = output_path.with_suffix(".part")
 
     try:
         emit_progress("update", 30)
@@ -128,20 +167,22 @@ def install_update(version: str, nightly: bool = False) -> dict:
         response = urlopen(req, timeout=120)
         total = int(response.headers.get("Content-Length", 0))
 
-        with open(output_path, "wb") as f:
-            downloaded = 0
-            while True:
-                chunk = response.read(65536)
-                if not chunk:
-                    break
-                f.write(chunk)
-                downloaded += len(chunk)
-                if total > 0:
-                    pct = 30 + (downloaded / total) * 60
-                    emit_progress("update", pct)
+        with open(part_path, "wb") as f:
+            writer = _ProgressFile(f, total)
+            shutil.copyfileobj(response, writer, length=DOWNLOAD_CHUNK)
+
+        digest = writer.sha256.hexdigest()
+        if expected_digest.startswith("sha256:"):
+            if expected_digest[len("sha256:"):].lower() != digest:
+                part_path.unlink(missing_ok=True)
+                emit_error("update_error", "Downloaded yt-dlp failed SHA-256 verification")
+                return {"success": False}
+        else:
+            emit_log("info", f"yt-dlp {version} sha256: {digest}")
 
         # Make executable
-        output_path.chmod(output_path.stat().st_mode | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
+        part_path.chmod(part_path.stat().st_mode | stat.S_IEXEC | stat.S_IXGRP | stat.S_IXOTH)
+        os.replace(part_path, output_path)
 
         # Save version
         VERSION_FILE.write_text(version)
@@ -151,6 +192,7 @@ def install_update(version: str, nightly: bool = False) -> dict:
         return {"success": True, "version": version, "path": str(output_path)}
 
     except Exception as e:
+        part_path.unlink(missing_ok=True)
         emit_error("update_error", f"Download failed: {e}")
         return {"success": False}
 
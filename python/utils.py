@@ -2,13 +2,45 @@
 Utility functions: filename sanitization, URL parsing, file finding, time formatting.
 """
 
+import fnmatch
+import functools
 import os
-import re
+import stat
+import threading
 import time
 from pathlib import Path
+from typing import NamedTuple
 from urllib.parse import urlparse, parse_qs
 
-
+try:
+    from watchdog.events import PatternMatchingEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+
+# Path separators become dashes; shell-dangerous characters are removed
+_STRIP_TABLE = str.maketrans("/:", "--", "&;$|`\\<>{}()[]!#^~'\"*?")
+# Byte-level equivalents for sanitize_filenames_batch. \x1c-\x1f count as
+# whitespace to str.split() but not bytes.split(), so map them to spaces.
+_ASCII_TRANSLATE = bytes.maketrans(b"/:\x1c\x1d\x1e\x1f", b"--    ")
+_ASCII_DELETE = b"&;$|`\\<>{}()[]!#^~'\"*?"
+
+# Canonical URL shapes parsed without urllib.parse
+_WATCH_URL_PREFIXES = tuple(
+    f"{scheme}://{host}/watch?"
+    for scheme in ("https", "http")
+    for host in ("www.youtube.com", "youtube.com", "m.youtube.com", "music.youtube.com")
+)
+_SHORT_URL_PREFIXES = ("https://youtu.be/", "http://youtu.be/")
+_YT_SHORT_HOSTS = frozenset({"youtu.be", "www.youtu.be"})
+# Auto-generated Mix/Radio playlist IDs start with this
+_MIX_PREFIX = "RD"
+# unique_filepath tries " (1)".." (n)" in order up to this many copies
+_LINEAR_PROBES = 16
+
+
+@functools.lru_cache(maxsize=8192)
 def sanitize_filename(name: str, max_length: int = 200) -> str:
     """
     Sanitize a string for safe use as a filename.
@@ -20,15 +52,11 @@ def sanitize_filename(name: str, max_length: int = 200) -> str:
     # Remove non-ASCII
     name = name.encode("ascii", errors="ignore").decode("ascii")
 
-    # Replace shell-dangerous characters
-    dangerous = r'[&;$|`\\<>{}()\[\]!#^~\'\"*?]'
-    name = re.sub(dangerous, "", name)
-
-    # Replace path separators and other problematic chars
-    name = name.replace("/", "-").replace(":", "-")
+    # Drop shell-dangerous characters, dash out path separators
+    name = name.translate(_STRIP_TABLE)
 
-    # Collapse whitespace
-    name = re.sub(r"\s+", " ", name).strip()
+    # Collapse whitespace (split() also trims the ends)
+    name = " ".join(name.split())
 
     # Remove leading/trailing dots and spaces
     name = name.strip(". ")
@@ -40,66 +68,184 @@ def sanitize_filename(name: str, max_length: int = 200) -> str:
     return name or "untitled"
 
 
+def sanitize_filenames_batch(names: list[str], max_length: int = 200) -> list[str]:
+    """
+    sanitize_filename over many names, working on ASCII bytes so each name
+    takes one encode, one translate and one split/join.
+    """
+    result = []
+    for name in names:
+        if not name:
+            result.append("untitled")
+            continue
+        b = name.encode("ascii", errors="ignore").translate(_ASCII_TRANSLATE, _ASCII_DELETE)
+        name = b" ".join(b.split()).decode("ascii").strip(". ")
+        if len(name) > max_length:
+            name = name[:max_length].strip()
+        result.append(name or "untitled")
+    return result
+
+
 def unique_filepath(path: Path) -> Path:
     """
     If path exists, append (1), (2), etc. to make it unique.
+    The first few numbers are tried in order, so a gap left by a deleted copy
+    is reused. Past that, a long run of duplicates is probed by doubling then
+    bisecting (O(log n) stat calls); the result is then unique but not
+    necessarily the lowest free number.
     """
     if not path.exists():
         return path
 
-    stem = path.stem
-    suffix = path.suffix
-    parent = path.parent
-    counter = 1
+    base = f"{path.parent}{os.sep}{path.stem} ("
+    suffix = f"){path.suffix}"
+
+    def taken(n: int) -> bool:
+        return os.path.exists(f"{base}{n}{suffix}")
+
+    for n in range(1, _LINEAR_PROBES + 1):
+        if not taken(n):
+            return Path(f"{base}{n}{suffix}")
+
+    # Find a free upper bound, then a free number just above the last
+    # known-taken one
+    lo = _LINEAR_PROBES
+    hi = lo << 1
+    while taken(hi):
+        lo, hi = hi, hi << 1
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if taken(mid):
+            lo = mid
+        else:
+            hi = mid
+
+    return Path(f"{base}{hi}{suffix}")
 
-    while True:
-        new_path = parent / f"{stem} ({counter}){suffix}"
-        if not new_path.exists():
-            return new_path
-        counter += 1
 
+class YTUrlInfo(NamedTuple):
+    video_id: str | None
+    playlist_id: str | None
+    is_playlist: bool
+    is_mix: bool
+    url: str
 
-def parse_youtube_url(url: str) -> dict:
+
+@functools.lru_cache(maxsize=256)
+def parse_youtube_url(url: str) -> YTUrlInfo:
     """
     Parse a YouTube URL and extract video_id, playlist_id, and URL type.
-    Returns dict with keys: video_id, playlist_id, is_playlist, is_mix
+    Results are cached, since the same URL is parsed by analyze and again by download.
     """
-    result = {
-        "video_id": None,
-        "playlist_id": None,
-        "is_playlist": False,
-        "is_mix": False,
-        "url": url.strip(),
-    }
-
-    try:
-        parsed = urlparse(url.strip())
-        params = parse_qs(parsed.query)
-    except Exception:
-        return result
-
-    # Extract video ID
-    if "v" in params:
-        result["video_id"] = params["v"][0]
-    elif parsed.hostname in ("youtu.be",):
-        result["video_id"] = parsed.path.lstrip("/").split("/")[0]
-
-    # Extract playlist ID
-    if "list" in params:
-        result["playlist_id"] = params["list"][0]
-        playlist_id = params["list"][0]
-
-        # Detect Mix playlists (auto-generated Radio playlists)
-        if playlist_id.startswith("RD"):
-            result["is_mix"] = True
+    url = url.strip()
+    fast = _split_youtube_url_fast(url)
+    if fast is not None:
+        video_id, playlist_id, path = fast
+    else:
+        try:
+            parsed = urlparse(url)
+            params = parse_qs(parsed.query)
+        except Exception:
+            return YTUrlInfo(None, None, False, False, url)
+        path = parsed.path
+
+        # Extract video ID
+        video_id = None
+        if "v" in params:
+            video_id = params["v"][0]
+        elif parsed.hostname in _YT_SHORT_HOSTS:
+            video_id = path.lstrip("/").split("/")[0]
+
+        # Extract playlist ID
+        playlist_id = params["list"][0] if "list" in params else None
+
+    # Detect Mix playlists (auto-generated Radio playlists)
+    is_mix = playlist_id is not None and playlist_id.startswith(_MIX_PREFIX)
 
     # Determine if this is a playlist URL
-    if parsed.path == "/playlist" or (
-        result["playlist_id"] and not result["video_id"]
-    ):
-        result["is_playlist"] = True
+    is_playlist = path == "/playlist" or bool(playlist_id and not video_id)
+
+    return YTUrlInfo(video_id, playlist_id, is_playlist, is_mix, url)
 
-    return result
+
+def _split_youtube_url_fast(url: str) -> tuple[str | None, str | None, str] | None:
+    """
+    (video_id, playlist_id, path) for plain watch and youtu.be URLs, or None
+    if the URL needs the full parser (escapes, fragments, other shapes).
+    """
+    if not url.isprintable() or "%" in url or "+" in url or "#" in url or ";" in url:
+        return None
+    if url.startswith(_WATCH_URL_PREFIXES):
+        path = "/watch"
+        query = url.partition("?")[2]
+        short_id = None
+    elif url.startswith(_SHORT_URL_PREFIXES):
+        rest, _, query = url.partition("/youtu.be/")[2].partition("?")
+        path = "/" + rest
+        short_id = rest.lstrip("/").split("/")[0]
+    else:
+        return None
+
+    # First non-empty value wins, as with parse_qs
+    video_id = playlist_id = None
+    for kv in query.split("&"):
+        if kv.startswith("v=") and video_id is None and len(kv) > 2:
+            video_id = kv[2:]
+        elif kv.startswith("list=") and playlist_id is None and len(kv) > 5:
+            playlist_id = kv[5:]
+    return (video_id if video_id is not None else short_id), playlist_id, path
+
+
+# Extensions yt-dlp may leave on a temp download
+_TEMP_EXTENSIONS = (".mp4", ".webm", ".mkv", ".m4a", ".opus", ".f137.mp4",
+                    ".f313.webm", ".f315.webm", ".f271.webm")
+# For membership tests on a name's last suffix; the compound .fNNN.ext
+# entries end in an extension already listed
+_TEMP_SUFFIXES = frozenset(_TEMP_EXTENSIONS)
+# In-progress yt-dlp files; never a finished temp download
+_PARTIAL_SUFFIXES = (".part", ".ytdl")
+
+
+def _wait_for_entry(directory: str, video_id: str, prefix: str, exclude_prefix: str, timeout: float):
+    """
+    Block until a finished <video_id><prefix>* file (regular, over 1 KiB)
+    appears in directory, or timeout. Without watchdog this is a plain sleep.
+    """
+    if Observer is None:
+        time.sleep(timeout)
+        return
+
+    ready = threading.Event()
+
+    def on_event(event):
+        # A rename (e.g. .part -> final name) lands on dest_path
+        path = getattr(event, "dest_path", "") or event.src_path
+        name = os.path.basename(path)
+        if name.endswith(_PARTIAL_SUFFIXES) or (exclude_prefix and exclude_prefix in name):
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        if stat.S_ISREG(st.st_mode) and st.st_size > 1024:
+            ready.set()
+
+    handler = PatternMatchingEventHandler(
+        patterns=[f"*{video_id}{prefix}*"], ignore_directories=True
+    )
+    handler.on_any_event = on_event
+    observer = Observer()
+    try:
+        observer.schedule(handler, directory)
+        observer.start()
+    except OSError:
+        time.sleep(timeout)
+        return
+    try:
+        ready.wait(timeout)
+    finally:
+        observer.stop()
+        observer.join()
 
 
 def find_temp_file(
@@ -113,50 +259,68 @@ def find_temp_file(
     Find a temp file after yt-dlp download. Handles filesystem race conditions.
     Searches multiple patterns and waits for filesystem sync.
     """
-    extensions = [".mp4", ".webm", ".mkv", ".m4a", ".opus", ".f137.mp4",
-                  ".f313.webm", ".f315.webm", ".f271.webm"]
-    dir_path = Path(directory)
+    # Attempt 0: yt-dlp's output names are predictable; stat them directly
+    for ext in _TEMP_EXTENSIONS:
+        name = f"{video_id}{prefix}{ext}"
+        if exclude_prefix and exclude_prefix in name:
+            continue
+        candidate = os.path.join(directory, name)
+        try:
+            st = os.stat(candidate)
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode) and st.st_size > 1024:
+            return candidate
 
     # Attempt 1: exact prefix match
-    for f in dir_path.iterdir():
-        if f.name.startswith(video_id + prefix) and f.suffix in extensions:
-            if exclude_prefix and exclude_prefix in f.name:
+    with os.scandir(directory) as it:
+        for e in it:
+            if e.name.startswith(video_id + prefix) and os.path.splitext(e.name)[1] in _TEMP_SUFFIXES:
+                if exclude_prefix and exclude_prefix in e.name:
+                    continue
+                st = e.stat(follow_symlinks=False)
+                if stat.S_ISREG(st.st_mode) and st.st_size > 1024:
+                    return e.path
+
+    # Attempt 2: wait for the file to show up, then retry
+    _wait_for_entry(directory, video_id, prefix, exclude_prefix, min(max_wait, 2.0))
+
+    # One directory read serves the remaining passes: regular files over
+    # 1 KiB that mention video_id
+    entries = []
+    with os.scandir(directory) as it:
+        for e in it:
+            if video_id not in e.name or (exclude_prefix and exclude_prefix in e.name):
                 continue
-            if f.stat().st_size > 1024:
-                return str(f)
-
-    # Attempt 2: wait and retry
-    time.sleep(min(max_wait, 2.0))
+            st = e.stat(follow_symlinks=False)
+            if stat.S_ISREG(st.st_mode) and st.st_size > 1024:
+                entries.append((e.name, e.path))
 
     # Attempt 3: broader search by video_id
-    for f in dir_path.iterdir():
-        if video_id in f.name and prefix.lstrip("_") in f.name:
-            if exclude_prefix and exclude_prefix in f.name:
-                continue
-            if f.stat().st_size > 1024:
-                return str(f)
-
-    # Attempt 4: glob search
-    for pattern in [f"*{video_id}*{prefix}*", f"*{video_id}*"]:
-        matches = list(dir_path.glob(pattern))
-        for m in matches:
-            if exclude_prefix and exclude_prefix in m.name:
-                continue
-            if m.is_file() and m.stat().st_size > 1024:
-                return str(m)
+    for name, path in entries:
+        if prefix.lstrip("_") in name:
+            return path
+
+    # Attempt 4: glob-style patterns, most specific first
+    for pattern in (f"*{video_id}*{prefix}*", f"*{video_id}*"):
+        for name, path in entries:
+            if fnmatch.fnmatchcase(name, pattern):
+                return path
 
     return None
 
 
+_SIZE_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+
+
+@functools.lru_cache(maxsize=1024)
 def format_size(bytes_val: int | float) -> str:
     """Format byte count to human readable string."""
     if bytes_val <= 0:
         return "0 B"
-    for unit in ["B", "KB", "MB", "GB", "TB"]:
-        if bytes_val < 1024:
-            return f"{bytes_val:.1f} {unit}"
-        bytes_val /= 1024
-    return f"{bytes_val:.1f} PB"
+    # Unit index is floor(log1024(n)), read off the bit length
+    idx = min((int(bytes_val).bit_length() - 1) // 10, 5) if bytes_val >= 1 else 0
+    return f"{bytes_val / (1 << (10 * idx)):.1f} {_SIZE_UNITS[idx]}"
 
 
 def estimate_filesize(bitrate_kbps: float, duration_secs: float) -> int:
@@ -164,15 +328,17 @@ def estimate_filesize(bitrate_kbps: float, duration_secs: float) -> int:
     return int((bitrate_kbps * 1000 / 8) * duration_secs)
 
 
+# Large enough to hold every HH:MM:SS in a day
+@functools.lru_cache(maxsize=131072)
 def parse_time_str(time_str: str) -> float:
     """Parse MM:SS or HH:MM:SS string to seconds."""
-    parts = time_str.strip().split(":")
+    first, sep, rest = time_str.strip().partition(":")
     try:
-        if len(parts) == 3:
-            return int(parts[0]) * 3600 + int(parts[1]) * 60 + float(parts[2])
-        elif len(parts) == 2:
-            return int(parts[0]) * 60 + float(parts[1])
-        else:
-            return float(parts[0])
-    except (ValueError, IndexError):
+        if not sep:
+            return float(first)
+        second, sep, third = rest.partition(":")
+        if sep:
+            return int(first) * 3600 + int(second) * 60 + float(third)
+        return int(first) * 60 + float(second)
+    except ValueError:
         return 0.0
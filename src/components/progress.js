@@ -3,12 +3,14 @@
  */
 
 const STAGE_LABELS = {
+  download: 'Downloading video and audio...',
   download_video: 'Downloading video...',
   download_audio: 'Downloading audio...',
   convert: 'Encoding...',
   sponsorblock: 'Removing sponsors...',
   split_chapters: 'Splitting chapters...',
   complete: 'Complete!',
+  download_retry: 'Retrying download...',
   download_video_retry: 'Retrying video download...',
   download_audio_retry: 'Retrying audio download...',
   analyze: 'Analyzing...',
@@ -0,0 +1,38 @@
+import contextlib
+import io
+import json
+import sys
+import threading
+import unittest
+
+from python import analyze
+
+
+@unittest.skipIf(analyze.ijson is None, "ijson not installed")
+class StreamPlaylistTest(unittest.TestCase):
+    def test_malformed_json_with_trailing_output_does_not_hang(self):
+        # Malformed JSON, then more than a pipe buffer of further output
+        script = (
+            "import sys; sys.stdout.write('{\"entries\": [}'); "
+            "sys.stdout.write('x' * (1 << 20)); sys.stdout.flush()"
+        )
+        out = io.TextIOWrapper(io.BytesIO(), encoding="utf-8")
+        result = []
+
+        def run():
+            with contextlib.redirect_stdout(out):
+                result.append(analyze._stream_playlist([sys.executable, "-c", script]))
+
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        worker.join(timeout=30)
+        self.assertFalse(worker.is_alive(), "_stream_playlist hung on malformed output")
+
+        self.assertEqual(result, [None])
+        out.flush()
+        events = [json.loads(line) for line in out.buffer.getvalue().splitlines()]
+        self.assertEqual(events[-1]["code"], "parse_error")
+
+
+if __name__ == "__main__":
+    unittest.main()